@@ -0,0 +1,267 @@
+"""Columnar analytics over habit and mood history.
+
+History is loaded once into a dense ``day × habit`` duration matrix plus a
+mood vector, both indexed by the day's offset from the first loaded day.
+Every aggregate is then a vectorised reduction over those arrays instead of
+per-day dict lookups. Day numbers are ``storage.to_day_number`` ordinals.
+
+numpy is imported here, so ``app`` imports this module lazily to keep
+startup light.
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+import storage
+
+# Day number of 1970-01-01, the epoch of ``datetime64[D]``.
+EPOCH = 719163
+EMPTY_MOOD = -1
+
+
+def _average(total, count):
+    return round(int(total) / int(count), 1) if count else 0
+
+
+def day_numbers(dates):
+    """Parse ISO date strings into an array of day numbers in one go."""
+    parsed = np.array(dates, dtype="datetime64[D]")
+    return parsed.astype(np.int64) + EPOCH
+
+
+def month_numbers(days):
+    """Return ``year * 12 + month - 1`` for each day number."""
+    months = (np.asarray(days) - EPOCH).astype("datetime64[D]").astype("datetime64[M]")
+    return months.astype(np.int64) + 1970 * 12
+
+
+def runs(mask):
+    """Run-length encode a ``habit × day`` boolean matrix.
+
+    Returns ``(rows, starts, lengths)`` with one element per run of ``True``
+    values; ``starts`` are column offsets. Runs come out grouped by row and
+    in column order.
+    """
+    rows = mask.shape[0]
+    padded = np.zeros((rows, mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    run_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return run_rows, starts, ends - starts
+
+
+def downsample(x, y, points):
+    """Pick at most ``points`` indices of the line ``(x, y)`` to plot.
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept and
+    each bucket in between contributes the point forming the largest
+    triangle with the previous pick and the next bucket's mean, so peaks
+    and dips survive.
+    """
+    n = len(x)
+    if n <= points:
+        return np.arange(n)
+    if points < 3:
+        return np.linspace(0, n - 1, max(points, 0)).astype(np.intp)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.intp)
+    keep = np.empty(points, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+class History:
+    """Dense habit durations and moods for a contiguous span of days.
+
+    ``durations[i, j]`` is the minutes logged for ``habits[j]`` on day
+    ``base + i`` (0 when nothing was logged); ``moods[i]`` is that day's
+    score or ``EMPTY_MOOD``. Days outside the span read as empty.
+    """
+
+    def __init__(self, habits, base, durations, moods):
+        self.habits = list(habits)
+        self.base = base
+        self.durations = durations
+        self.moods = moods
+
+    @classmethod
+    def load(cls, entries, habits):
+        """Build the arrays from ``iter_entries()`` rows (or a ``load_all()`` dict).
+
+        Only ``habits`` get a column; other habit keys, empty durations and
+        non-integer moods are ignored like the dashboard does.
+        """
+        if isinstance(entries, Mapping):
+            entries = storage.iter_dict_entries(entries)
+        column = {key: i for i, key in enumerate(habits)}
+        habit_dates, habit_cols, minutes = [], [], []
+        mood_dates, scores = [], []
+        for entry in entries:
+            if isinstance(entry, storage.HabitEntry):
+                col = column.get(entry.habit)
+                if col is None or not entry.duration:
+                    continue
+                habit_dates.append(entry.date)
+                habit_cols.append(col)
+                minutes.append(entry.duration)
+            elif isinstance(entry.score, int):
+                mood_dates.append(entry.date)
+                scores.append(entry.score)
+
+        habit_days = day_numbers(habit_dates)
+        mood_days = day_numbers(mood_dates)
+        all_days = np.concatenate((habit_days, mood_days))
+        if not len(all_days):
+            empty = np.zeros((0, len(column)), dtype=np.int32)
+            return cls(habits, 0, empty, np.zeros(0, dtype=np.int16))
+        base = int(all_days.min())
+        size = int(all_days.max()) - base + 1
+
+        durations = np.zeros((size, len(column)), dtype=np.int32)
+        durations[habit_days - base, np.array(habit_cols, dtype=np.intp)] = minutes
+        moods = np.full(size, EMPTY_MOOD, dtype=np.int16)
+        moods[mood_days - base] = scores
+        return cls(habits, base, durations, moods)
+
+    @property
+    def end(self):
+        """Day number one past the last loaded day."""
+        return self.base + len(self.moods)
+
+    def window(self, start, end):
+        """Return the ``(end - start + 1) × habit`` durations for ``start..end``.
+
+        Days outside the loaded span are zero-filled.
+        """
+        out = np.zeros((max(end - start + 1, 0), len(self.habits)), dtype=np.int32)
+        lo, hi = max(start, self.base), min(end + 1, self.end)
+        if lo < hi:
+            out[lo - start : hi - start] = self.durations[lo - self.base : hi - self.base]
+        return out
+
+    def mood_window(self, start, end):
+        out = np.full(max(end - start + 1, 0), EMPTY_MOOD, dtype=np.int16)
+        lo, hi = max(start, self.base), min(end + 1, self.end)
+        if lo < hi:
+            out[lo - start : hi - start] = self.moods[lo - self.base : hi - self.base]
+        return out
+
+    # ── habit aggregates ─────────────────────────────────────────────
+
+    def totals(self, start, end):
+        """Minutes per habit over ``start..end``."""
+        return self.window(start, end).sum(axis=0, dtype=np.int64)
+
+    def counts(self, start, end):
+        """Days with a logged duration per habit over ``start..end``."""
+        return np.count_nonzero(self.window(start, end), axis=0)
+
+    def averages(self, start, end):
+        """Average minutes per logged day, rounded like the dashboard."""
+        return [
+            _average(total, count)
+            for total, count in zip(self.totals(start, end), self.counts(start, end))
+        ]
+
+    def completion_rates(self, start, end):
+        """Fraction of days in ``start..end`` each habit was done."""
+        days = max(end - start + 1, 1)
+        return self.counts(start, end) / days
+
+    def _grouped(self, start, end, keys):
+        block = self.window(start, end)
+        if not len(block):
+            return [], np.zeros((0, len(self.habits)), dtype=np.int64)
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return keys[first], np.add.reduceat(block.astype(np.int64), first, axis=0)
+
+    def weekly_totals(self, start, end):
+        """Return ``(monday_day_numbers, week × habit minutes)`` for ``start..end``."""
+        days = np.arange(start, end + 1)
+        return self._grouped(start, end, days - (days - 1) % 7)
+
+    def monthly_totals(self, start, end):
+        """Return ``(month_numbers, month × habit minutes)`` for ``start..end``.
+
+        Month numbers are ``year * 12 + month - 1``.
+        """
+        return self._grouped(start, end, month_numbers(np.arange(start, end + 1)))
+
+    def buckets(self, start, end, size):
+        """Return ``(keys, bucket × habit minutes)`` for ``start..end``.
+
+        ``size`` is ``"day"``, ``"week"`` or ``"month"``; keys are day
+        numbers, Monday day numbers or month numbers respectively.
+        """
+        if size == "day":
+            return np.arange(start, end + 1), self.window(start, end)
+        if size == "week":
+            return self.weekly_totals(start, end)
+        if size == "month":
+            return self.monthly_totals(start, end)
+        raise ValueError(f"unknown bucket size: {size}")
+
+    def streaks(self, today):
+        """Current and longest run per habit, ignoring days after ``today``.
+
+        Returns two integer arrays in ``habits`` order. A current streak must
+        include ``today``.
+        """
+        if not len(self.moods):
+            empty = np.zeros(len(self.habits), dtype=np.int64)
+            return empty, empty.copy()
+        done = self.window(self.base, today).T > 0
+        rows, starts, lengths = runs(done)
+        longest = np.zeros(len(self.habits), dtype=np.int64)
+        np.maximum.at(longest, rows, lengths)
+        current = np.zeros(len(self.habits), dtype=np.int64)
+        live = starts + lengths == done.shape[1]
+        current[rows[live]] = lengths[live]
+        return current, longest
+
+    # ── mood ────────────────────────────────────────────────────────
+
+    def mood_summary(self, today):
+        """Weekly, 30-day and overall averages as ``storage.summarize_moods``."""
+        week_start, month_start = storage.mood_windows(today)
+        logged = self.moods != EMPTY_MOOD
+        days = np.arange(self.base, self.end)
+        stats = {}
+        for name, start in (("weekly_avg", week_start), ("30d_avg", month_start)):
+            mask = logged & (days >= start)
+            stats[name] = _average(self.moods[mask].sum(dtype=np.int64), mask.sum())
+        stats["overall_avg"] = _average(
+            self.moods[logged].sum(dtype=np.int64), logged.sum()
+        )
+        return stats
+
+    def mood_series(self, start=None, end=None, points=None):
+        """Return ``[{"date", "score"}]`` for logged moods in date order.
+
+        With ``points`` the series is downsampled to at most that many
+        entries (see ``downsample``).
+        """
+        start = self.base if start is None else start
+        end = self.end - 1 if end is None else end
+        scores = self.mood_window(start, end)
+        offsets = np.flatnonzero(scores != EMPTY_MOOD)
+        if points is not None:
+            offsets = offsets[downsample(offsets, scores[offsets], points)]
+        dates = (offsets + start - EPOCH).astype("datetime64[D]").astype(str)
+        return [
+            {"date": date, "score": int(score)}
+            for date, score in zip(dates.tolist(), scores[offsets].tolist())
+        ]
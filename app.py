@@ -1,13 +1,30 @@
-from flask import Flask, render_template, request, redirect, send_file
-import json, os, datetime, csv
+from flask import (
+    Flask, g, has_request_context, render_template, request, redirect, send_file
+)
+import json, os, datetime, csv, hashlib, threading, functools, itertools, time, zlib
+import base64
 from pathlib import Path
+import io
 from io import StringIO
+from contextlib import closing
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from jinja2 import FileSystemBytecodeCache
 from config import DevConfig, ProdConfig
 import storage
-import openai
 
 app = Flask(__name__)
 
+# Compiled templates survive restarts, so a cold start skips Jinja parsing.
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", "data/.jinja_cache")
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_options = {
+        **app.jinja_options,
+        "bytecode_cache": FileSystemBytecodeCache(JINJA_CACHE_DIR),
+    }
+
 
 def create_app(mode=None):
     """Configure the global Flask app based on APP_MODE."""
@@ -25,6 +42,14 @@ def create_app(mode=None):
 # Apply configuration at import so gunicorn sees the correct settings.
 create_app()
 
+
+def warm_templates() -> int:
+    """Compile every template up front and return how many there are."""
+    names = app.jinja_env.list_templates(extensions=["html"])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
 DATA_FILE = Path.home() / ".habit_log.json"
 CONFIG_FILE = Path.home() / ".habit_config.json"
 JOURNAL_FILE = Path("journal.md")
@@ -75,74 +100,77 @@ def format_week_label(start: datetime.date) -> str:
     return f"{start.strftime('%b %d, %Y')} – {end.strftime('%b %d, %Y')}"
 
 
+def _as_entries(data, kinds=storage.KINDS):
+    """Accept a ``load_all()``-style dict or an ``iter_entries()`` stream."""
+    if isinstance(data, Mapping):
+        return storage.iter_dict_entries(data, kinds=kinds)
+    return data
+
+
 def calculate_habit_stats(
-    all_data: dict[str, dict], week: list[datetime.date]
+    entries, week: list[datetime.date]
 ) -> dict[str, dict]:
-    """Return per-habit streak length and average duration for the week."""
-    stats = {}
-    config = load_config()
-    today = datetime.date.today()
-    for key, info in config.items():
-        label = info["label"]
-        total_duration = 0
-        count = 0
+    """Return per-habit streak length and average duration for the week.
 
-        # Average duration uses only the provided week subset
-        for day in week:
-            entry = all_data.get(str(day), {}).get(key)
-            if isinstance(entry, dict) and entry.get("duration"):
-                total_duration += entry["duration"]
-                count += 1
-
-        # Compute streak walking backward from today using all loaded data
-        streak = 0
-        cur = today
-        while True:
-            # Skip future dates so they don't break the streak
-            entry = all_data.get(str(cur), {}).get(key)
-            if isinstance(entry, dict) and entry.get("duration"):
-                streak += 1
-                cur -= datetime.timedelta(days=1)
-            else:
-                break
+    ``entries`` is an ``iter_entries()`` stream (or a ``load_all()`` dict);
+    it is loaded once into an ``analytics.History`` and the stats are
+    vectorised over that.
+    """
+    import analytics
 
-        avg = round(total_duration / count, 1) if count else 0
-        stats[key] = {"label": label, "streak": streak, "avg_duration": avg}
+    config = request_data().config() if has_request_context() else load_config()
+    history = analytics.History.load(_as_entries(entries, kinds=("habit",)), config)
+    start, end = storage.to_day_number(week[0]), storage.to_day_number(week[-1])
+    averages = history.averages(start, end)
+    streaks, _ = history.streaks(datetime.date.today().toordinal())
+
+    stats = {}
+    for i, (key, info) in enumerate(config.items()):
+        stats[key] = {
+            "label": info["label"],
+            "streak": int(streaks[i]),
+            "avg_duration": averages[i],
+        }
     return stats
 
 
-def calculate_mood_stats(data):
-    """Return mood statistics and time series from saved data."""
-    today = datetime.date.today()
-    entries = []
-    for date_str, info in data.items():
-        mood = info.get("mood")
-        if isinstance(mood, int):
-            try:
-                date = datetime.date.fromisoformat(date_str)
-            except ValueError:
-                continue
-            entries.append((date, mood))
-    entries.sort(key=lambda x: x[0])
+def summarize_habit_stats(
+    config: dict[str, dict],
+    week_data: dict[str, dict],
+    week: list[datetime.date],
+    streaks: dict[str, dict],
+) -> dict[str, dict]:
+    """Dashboard stats from a loaded week plus the backend's streak index.
 
-    scores = [score for _, score in entries]
+    Produces the same shape and values as ``calculate_habit_stats`` without
+    scanning history.
+    """
+    stats = {}
+    for key, info in config.items():
+        durations = []
+        for day in week:
+            entry = week_data.get(str(day), {}).get(key)
+            if isinstance(entry, Mapping) and entry.get("duration"):
+                durations.append(entry["duration"])
+        avg = round(sum(durations) / len(durations), 1) if durations else 0
+        streak = streaks.get(key, {}).get("streak", 0)
+        stats[key] = {"label": info["label"], "streak": streak, "avg_duration": avg}
+    return stats
 
-    def avg(seq):
-        return round(sum(seq) / len(seq), 1) if seq else 0
 
-    week_start = today - datetime.timedelta(days=6)
-    month_start = today - datetime.timedelta(days=29)
-    weekly_scores = [s for d, s in entries if d >= week_start]
-    month_scores = [s for d, s in entries if d >= month_start]
+def calculate_mood_stats(data):
+    """Return mood statistics and time series from saved data.
 
-    series = [{"date": d.isoformat(), "score": s} for d, s in entries]
+    ``data`` is a date-ordered ``iter_entries()`` stream (or a ``load_all()``
+    dict). This is the full recompute; the dashboard reads the maintained
+    aggregates via ``get_mood_summary`` instead.
+    """
+    import analytics
 
-    return {
-        "weekly_avg": avg(weekly_scores),
-        "30d_avg": avg(month_scores),
-        "overall_avg": avg(scores),
-        "series": series,
-    }
+    history = analytics.History.load(_as_entries(data, kinds=("mood",)), ())
+    stats = history.mood_summary(datetime.date.today().toordinal())
+    stats["series"] = history.mood_series()
+    return stats
 
 
 def load_config() -> dict[str, dict]:
@@ -167,20 +195,15 @@ def save_config(cfg: dict[str, dict]) -> None:
 
 def generate_journal_prompt(data):
     today = datetime.date.today()
-    last_7 = sorted(
-        [(d, entry.get("mood")) for d, entry in data.items() if "mood" in entry]
-    )[-7:]
+    last_7 = deque(maxlen=7)
+    recent_notes = deque(maxlen=3)
+    for entry in _as_entries(data):
+        if isinstance(entry, storage.MoodEntry):
+            last_7.append(entry.score)
+        elif entry.note:
+            recent_notes.append(f"{entry.date}: {entry.note}")
 
-    avg_mood = (
-        round(sum(score for _, score in last_7) / len(last_7), 1) if last_7 else "N/A"
-    )
-
-    recent_notes = [
-        f"{d}: {entry.get(h, {}).get('note')}"
-        for d, entry in data.items()
-        for h in entry
-        if isinstance(entry.get(h), dict) and entry[h].get("note")
-    ][-3:]
+    avg_mood = round(sum(last_7) / len(last_7), 1) if last_7 else "N/A"
 
     summary = f"""
 Mood Journal Prompt for {today.strftime('%A, %B %d')}:
@@ -196,22 +219,251 @@ Reflect on:
     return summary.strip()
 
 
-def enrich_prompt_with_ai(prompt):
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+AI_SYSTEM_MESSAGE = "You are a thoughtful self-reflection assistant."
+
+# Enriched prompts keyed by (model, system message, base prompt).
+# AI_CACHE_FILE= (empty) disables the cache.
+_ai_cache_file = os.getenv("AI_CACHE_FILE", "data/ai_prompt_cache.json")
+PROMPT_CACHE = (
+    storage.PromptCache(
+        _ai_cache_file,
+        ttl=int(os.getenv("AI_CACHE_TTL", "86400")),
+        maxsize=int(os.getenv("AI_CACHE_SIZE", "256")),
+    )
+    if _ai_cache_file
+    else None
+)
+
+
+def ai_cache_key(prompt: str) -> str:
+    return storage.PromptCache.key(
+        os.getenv("AI_MODEL", "gpt-4"), AI_SYSTEM_MESSAGE, prompt
+    )
+
+
+def cached_ai_prompt(prompt: str):
+    """Return the cached enrichment of ``prompt``, or ``None``."""
+    if PROMPT_CACHE is None:
+        return None
+    return PROMPT_CACHE.get(ai_cache_key(prompt))
+
+
+class AIGuard:
+    """Bulkhead, hard deadline and circuit breaker around AI calls.
+
+    At most ``max_concurrency`` calls run at once and extra callers are
+    turned away immediately instead of queueing. A caller waits no more than
+    ``timeout`` seconds. After ``threshold`` consecutive failures or timeouts
+    the breaker opens and calls are skipped for ``cooldown`` seconds; then a
+    single trial call decides whether it closes again. ``stats()`` exposes
+    the state and counters.
+    """
+
+    COUNTERS = (
+        "calls", "successes", "failures", "timeouts",
+        "rejected", "short_circuited", "opens",
+    )
+
+    def __init__(self, max_concurrency=2, timeout=10.0, threshold=3, cooldown=30.0):
+        self.timeout = timeout
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.in_flight = 0
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="ai-call"
+        )
+
+    def _admit(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self.counters["short_circuited"] += 1
+                    return False
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open":
+                if self._trial:
+                    self.counters["short_circuited"] += 1
+                    return False
+                self._trial = True
+            if not self._slots.acquire(blocking=False):
+                self.counters["rejected"] += 1
+                self._trial = False
+                return False
+            self.counters["calls"] += 1
+            self.in_flight += 1
+            return True
+
+    def _release(self, job) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _record(self, ok: bool, timeout: bool = False) -> None:
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.counters["successes"] += 1
+                self._failures = 0
+                self.state = "closed"
+                return
+            self.counters["timeouts" if timeout else "failures"] += 1
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.threshold:
+                if self.state != "open":
+                    self.counters["opens"] += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def call(self, fn, *args):
+        """Return ``fn(*args)``, or ``None`` if skipped, failed or too slow.
+
+        A timed-out call keeps its slot until it actually finishes, so slow
+        calls cannot pile up past the concurrency limit.
+        """
+        if not self._admit():
+            return None
+        job = self._executor.submit(fn, *args)
+        job.add_done_callback(self._release)
+        try:
+            result = job.result(timeout=self.timeout)
+        except FuturesTimeout:
+            self._record(False, timeout=True)
+            return None
+        except Exception:
+            self._record(False)
+            return None
+        self._record(True)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "in_flight": self.in_flight, **self.counters}
+
+
+AI_GUARD = AIGuard(
+    max_concurrency=int(os.getenv("AI_MAX_CONCURRENCY", "2")),
+    timeout=float(os.getenv("AI_TIMEOUT", "10")),
+    threshold=int(os.getenv("AI_BREAKER_THRESHOLD", "3")),
+    cooldown=float(os.getenv("AI_BREAKER_COOLDOWN", "30")),
+)
+
+
+def _complete(api_key: str, model: str, prompt: str) -> str:
+    # Deferred: importing the SDK dominates the app's cold start.
+    import openai
+
+    # OPENAI_BASE_URL, when set, points the client at another server.
+    client = openai.OpenAI(api_key=api_key, timeout=AI_GUARD.timeout, max_retries=0)
+    completion = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": AI_SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt + "\nPlease expand this into a personal reflection prompt."},
+        ],
+    )
+    return completion.choices[0].message.content.strip()
+
+
+def enrich_prompt_with_ai(prompt, refresh=False):
+    """Expand ``prompt`` with the AI, falling back to ``prompt`` itself.
+
+    Successful results are cached in ``PROMPT_CACHE``; ``refresh=True``
+    skips the lookup and overwrites the entry. The call itself goes through
+    ``AI_GUARD``.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
     model = os.getenv("AI_MODEL", "gpt-4")
-    if not openai.api_key:
+    if not api_key:
         return prompt
-    try:
-        completion = openai.ChatCompletion.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a thoughtful self-reflection assistant."},
-                {"role": "user", "content": prompt + "\nPlease expand this into a personal reflection prompt."},
-            ],
-        )
-        return completion.choices[0].message["content"].strip()
-    except Exception:
+    if not refresh:
+        cached = cached_ai_prompt(prompt)
+        if cached is not None:
+            return cached
+    enriched = AI_GUARD.call(_complete, api_key, model, prompt)
+    if enriched is None:
         return prompt
+    if PROMPT_CACHE is not None:
+        PROMPT_CACHE.put(ai_cache_key(prompt), enriched)
+    return enriched
+
+
+def prompt_key(prompt: str) -> str:
+    """Return a short digest identifying a base journal prompt."""
+    return hashlib.sha1(prompt.encode()).hexdigest()[:16]
+
+
+class PromptPrecomputer:
+    """Enriches journal prompts with AI on a background thread.
+
+    Results are keyed by ``prompt_key`` of the base prompt, so a prompt
+    built from older history is never served once the history changes. The
+    newest ``maxsize`` results are kept.
+    """
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get(self, key: str):
+        """Return the enriched prompt for ``key``, or ``None`` if not ready."""
+        with self._lock:
+            return self._results.get(key)
+
+    def pending(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def schedule(self, prompt: str, refresh: bool = False):
+        """Start enriching ``prompt`` unless it is done or already running.
+
+        ``refresh=True`` discards a finished result and bypasses the prompt
+        cache. Returns the job's future, or ``None`` when there is nothing
+        to do.
+        """
+        key = prompt_key(prompt)
+        with self._lock:
+            if refresh:
+                self._results.pop(key, None)
+            if key in self._results or key in self._pending:
+                return self._pending.get(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="ai-prompt"
+                )
+            job = self._pending[key] = self._executor.submit(
+                self._enrich, key, prompt, refresh
+            )
+            return job
+
+    def _enrich(self, key: str, prompt: str, refresh: bool) -> str:
+        try:
+            enriched = enrich_prompt_with_ai(prompt, refresh=refresh)
+        except Exception:
+            enriched = prompt
+        with self._lock:
+            self._pending.pop(key, None)
+            self._results[key] = enriched
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return enriched
+
+
+AI_PROMPTS = PromptPrecomputer()
+
+
+def ai_enabled() -> bool:
+    return bool(os.getenv("OPENAI_API_KEY"))
 
 
 def get_storage_backend():
@@ -219,20 +471,224 @@ def get_storage_backend():
     return storage.get_backend(json_path=str(DATA_FILE))
 
 
+class RequestData:
+    """Request-scoped memo of config and storage reads.
+
+    One instance lives on ``flask.g`` per request (see ``request_data``).
+    Repeated reads are served from memory, a week slice is cut from the full
+    history when that is already loaded, and ``calls`` counts the backend
+    round-trips actually made.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = 0
+        self._config = None
+        self._history = None
+        self._memo = {}
+
+    def config(self) -> dict[str, dict]:
+        if self._config is None:
+            self._config = load_config()
+        return self._config
+
+    def fetch(self, method: str, *args):
+        """Call ``backend.<method>(*args)`` once per request."""
+        key = (method, args)
+        if key not in self._memo:
+            self.calls += 1
+            self._memo[key] = getattr(self.backend, method)(*args)
+        return self._memo[key]
+
+    def history(self) -> "storage.CompactHistory":
+        """Return the full history as a dict-like ``CompactHistory``."""
+        if self._history is None:
+            self._history = self.fetch("load_compact")
+        return self._history
+
+    def week(self, week: list[datetime.date]) -> dict[str, dict]:
+        """Return ``get_range`` data for ``week``."""
+        if self._history is not None:
+            return {str(day): self._history.get(str(day), {}) for day in week}
+        return self.fetch("get_range", str(week[0]), str(week[-1]))
+
+    def entries(self, start=None, end=None, kinds=storage.KINDS):
+        """Stream ``iter_entries`` rows; not memoized as it is read once."""
+        self.calls += 1
+        return self.backend.iter_entries(start, end, kinds)
+
+    def write(self, method: str, *args):
+        """Call a mutating backend method and forget memoized reads."""
+        self.calls += 1
+        self._memo.clear()
+        self._history = None
+        return getattr(self.backend, method)(*args)
+
+
+def request_data() -> RequestData:
+    """Return this request's ``RequestData``, creating it on first use."""
+    if "request_data" not in g:
+        g.request_data = RequestData(get_storage_backend())
+    return g.request_data
+
+
+@app.after_request
+def report_storage_calls(response):
+    loader = g.get("request_data")
+    if loader is not None:
+        response.headers["X-Storage-Calls"] = str(loader.calls)
+    return response
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered template fragments."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+GRID_CACHE = FragmentCache(int(os.getenv("GRID_CACHE_SIZE", "128")))
+
+
+def config_version(config: dict[str, dict]) -> str:
+    """Return a short digest identifying ``config``."""
+    raw = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def grid_key(loader: RequestData, week: list[datetime.date]) -> tuple:
+    """Return the cache key of the rendered grid for ``week``.
+
+    The key changes when the week's data, the habit config or the current
+    day (which controls the log buttons) changes.
+    """
+    return (
+        id(loader.backend),
+        str(week[0]),
+        config_version(loader.config()),
+        str(datetime.date.today()),
+        loader.fetch("get_data_version", str(week[0]), str(week[-1])),
+    )
+
+
+def grid_etag(key: tuple) -> str:
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+
+
+def render_grid(loader: RequestData, week: list[datetime.date], key=None) -> str:
+    """Return ``_habit_row.html`` for ``week``, rendering only on a cache miss."""
+    key = key or grid_key(loader, week)
+    grid = GRID_CACHE.get(key)
+    if grid is None:
+        grid = render_template(
+            "_habit_row.html",
+            habits=loader.config(),
+            data=loader.week(week),
+            week=week,
+            today=key[3],
+        )
+        GRID_CACHE.put(key, grid)
+    return grid
+
+
+def _config_stamp():
+    try:
+        st = os.stat(CONFIG_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def conditional(view):
+    """Serve ``view`` with validators derived from the backend's last write.
+
+    The ETag covers the backend write version, the config file, today's date
+    and the request URL; Last-Modified is the newest of the last write, the
+    config file and local midnight. Matching ``If-None-Match`` (or, without
+    one, ``If-Modified-Since``) requests get a 304 before the view runs, so
+    no storage reads or template rendering happen.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        loader = request_data()
+        version, written_at = loader.fetch("get_last_write")
+        config = _config_stamp()
+        today = datetime.date.today()
+        etag = hashlib.sha1(
+            repr(
+                (id(loader.backend), version, config, str(today), request.full_path)
+            ).encode()
+        ).hexdigest()[:20]
+        midnight = datetime.datetime.combine(today, datetime.time()).timestamp()
+        stamps = [midnight, written_at or 0, config[0] / 1e9 if config else 0]
+        last_modified = datetime.datetime.fromtimestamp(
+            int(max(stamps)), tz=datetime.timezone.utc
+        )
+
+        if request.if_none_match:
+            fresh = etag in request.if_none_match
+        else:
+            since = request.if_modified_since
+            fresh = since is not None and last_modified <= since
+        if fresh:
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    return wrapper
+
+
 @app.route("/")
+@conditional
 def index():
     debug_mode = request.args.get("debug") == "true"
     today = datetime.date.today()
     week = get_week_range()
-    backend = get_storage_backend()
-    data = backend.get_range(str(week[0]), str(week[-1]))
-    all_data = backend.load_all()
+    loader = request_data()
+    data = loader.week(week)
     mood = data.get(str(today), {}).get("mood")
-    mood_stats = calculate_mood_stats(all_data)
-    config = load_config()
-    stats = calculate_habit_stats(all_data, week)
+    mood_stats = loader.fetch(
+        "get_mood_summary",
+        str(today),
+        os.getenv("HABIT_VERIFY_AGGREGATES") == "1",
+    )
+    config = loader.config()
+    stats = summarize_habit_stats(
+        config, data, week, loader.fetch("get_streaks", tuple(config), str(today))
+    )
     return render_template(
         "index.html",
+        grid=render_grid(loader, week),
         habits=config,
         data=data,
         today=str(today),
@@ -253,22 +709,23 @@ def grid():
     except ValueError:
         offset = 0
     week = get_week_range(offset)
-    backend = get_storage_backend()
-    data = backend.get_range(str(week[0]), str(week[-1]))
-    config = load_config()
-    grid = render_template(
-        "_habit_row.html",
-        habits=config,
-        data=data,
-        week=week,
-        today=str(datetime.date.today()),
-    )
-    label = format_week_label(week[0])
-    return render_template(
-        "_grid_wrapper.html",
-        grid=grid,
-        week_label=label,
-    )
+    loader = request_data()
+    key = grid_key(loader, week)
+    etag = grid_etag(key)
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = app.make_response(
+            render_template(
+                "_grid_wrapper.html",
+                grid=render_grid(loader, week, key),
+                week_label=format_week_label(week[0]),
+            )
+        )
+    response.set_etag(etag)
+    # Let the browser keep the fragment but revalidate it on every request.
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.post("/log")
@@ -289,29 +746,18 @@ def log_habit():
     except (TypeError, ValueError):
         return {"error": "Duration must be a number"}, 400
 
-    backend = get_storage_backend()
+    loader = request_data()
     if request.args.get("delete") == "1":
-        backend.delete_habit(target_date, habit)
+        loader.write("delete_habit", target_date, habit)
     else:
-        backend.save_habit(target_date, habit, duration, note)
+        loader.write("save_habit", target_date, habit, duration, note)
 
     week = get_week_range()
-    data = backend.get_range(str(week[0]), str(week[-1]))
-    config = load_config()
-    grid = render_template(
-        "_habit_row.html",
-        habits=config,
-        data=data,
-        week=week,
-        today=str(datetime.date.today()),
-    )
-    label = format_week_label(week[0])
-    wrapper = render_template(
+    return render_template(
         "_grid_wrapper.html",
-        grid=grid,
-        week_label=label,
+        grid=render_grid(loader, week),
+        week_label=format_week_label(week[0]),
     )
-    return wrapper
 
 
 @app.route("/mood", methods=["POST"])
@@ -328,15 +774,121 @@ def log_mood():
     backend = get_storage_backend()
     today = str(datetime.date.today())
     backend.save_mood(today, score)
+    if ai_enabled():
+        # Have today's AI prompt ready by the time /journal is opened.
+        AI_PROMPTS.schedule(generate_journal_prompt(backend.iter_entries()))
     return {"status": "ok", "score": score}
 
 
+@app.post("/import")
+def import_entries():
+    """Bulk-load habit/mood records from a JSON array or NDJSON body/upload."""
+    upload = request.files.get("file")
+    raw = upload.read() if upload else request.get_data()
+    try:
+        entries = storage.parse_entries(raw.decode("utf-8"))
+        count = get_storage_backend().import_entries(entries)
+    except (UnicodeDecodeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}, 400
+    return {"status": "ok", "imported": count}
+
+
+EXPORT_FIELDS = ("date", "kind", "habit", "duration", "note", "score")
+EXPORT_CHUNK = 64 * 1024
+
+
+def export_lines(entries, fmt: str):
+    """Yield one CSV or NDJSON line per ``iter_entries()`` row.
+
+    NDJSON lines use the ``/import`` record format, so an export can be
+    loaded back as is.
+    """
+    if fmt == "ndjson":
+        for entry in entries:
+            if isinstance(entry, storage.MoodEntry):
+                record = {"date": entry.date, "mood": entry.score}
+            else:
+                record = entry._asdict()
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_FIELDS)
+    for entry in entries:
+        if isinstance(entry, storage.MoodEntry):
+            writer.writerow([entry.date, "mood", "", "", "", entry.score])
+        else:
+            writer.writerow(
+                [entry.date, "habit", entry.habit, entry.duration, entry.note, ""]
+            )
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def export_chunks(lines, compress: bool = False):
+    """Group ``lines`` into ~64 KiB byte chunks, optionally gzip-compressed."""
+    gz = zlib.compressobj(wbits=31) if compress else None
+    batch = []
+    size = 0
+    for line in lines:
+        batch.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK:
+            data = "".join(batch).encode()
+            batch, size = [], 0
+            data = gz.compress(data) if gz else data
+            if data:
+                yield data
+    data = "".join(batch).encode()
+    if gz:
+        data = gz.compress(data) + gz.flush()
+    if data:
+        yield data
+
+
+def export_entries():
+    """Stream history rows for ``start``..``end`` (inclusive, optional)."""
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return {"status": "error", "message": "format must be csv or ndjson"}, 400
+    bounds = []
+    for name in ("start", "end"):
+        value = request.args.get(name)
+        try:
+            bounds.append(str(datetime.date.fromisoformat(value)) if value else None)
+        except ValueError:
+            return {"status": "error", "message": f"{name} must be YYYY-MM-DD"}, 400
+    start, end = bounds
+    compress = request.args.get("gzip") == "1"
+    name = f"habit_export_{start or 'start'}_{end or 'end'}.{fmt}"
+    if compress:
+        name += ".gz"
+    entries = get_storage_backend().iter_entries(start, end)
+    return app.response_class(
+        export_chunks(export_lines(entries, fmt), compress),
+        mimetype="application/gzip" if compress else (
+            "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+        ),
+        headers={"Content-Disposition": f"attachment;filename={name}"},
+    )
+
+
 @app.route("/export")
+@conditional
 def export_csv():
-    backend = get_storage_backend()
+    """Export habits as CSV.
+
+    Without parameters this is the current week's checkmark grid. Any of
+    ``start``, ``end``, ``format`` or ``all`` switches to the streamed
+    per-entry export in ``export_entries``.
+    """
+    if {"start", "end", "format", "all"} & request.args.keys():
+        return export_entries()
+    loader = request_data()
     week = get_week_range()
-    data = backend.get_range(str(week[0]), str(week[-1]))
-    config = load_config()
+    data = loader.week(week)
+    config = loader.config()
 
     output = StringIO()
     writer = csv.writer(output)
@@ -357,46 +909,218 @@ def export_csv():
     )
 
 
+# Range name -> (days shown, bar bucket). "week" is the calendar week and
+# "all" starts at the first entry, so their lengths are not fixed.
+ANALYTICS_RANGES = {
+    "week": (7, "day"),
+    "month": (30, "day"),
+    "quarter": (91, "week"),
+    "year": (365, "week"),
+    "all": (None, "month"),
+}
+MOOD_CHART_POINTS = int(os.getenv("MOOD_CHART_POINTS", "120"))
+
+
+def analytics_range(name: str, today: datetime.date):
+    """Return ``(start, end)`` dates for a range; ``start`` is None for "all"."""
+    if name == "week":
+        week = get_week_range()
+        return week[0], week[-1]
+    days = ANALYTICS_RANGES[name][0]
+    if days is None:
+        return None, today
+    return today - datetime.timedelta(days=days - 1), today
+
+
+def bucket_label(key: int, size: str, range_name: str) -> str:
+    """Chart label for a day, Monday or month number from ``History.buckets``."""
+    if size == "month":
+        return datetime.date(key // 12, key % 12 + 1, 1).strftime("%b %Y")
+    day = datetime.date.fromordinal(key)
+    return day.strftime("%a" if range_name == "week" else "%b %d")
+
+
 @app.route("/analytics")
+@conditional
 def analytics():
-    debug_mode = request.args.get("debug") == "true"
-    backend = get_storage_backend()
-    week = get_week_range()
-    data = backend.get_range(str(week[0]), str(week[-1]))
-    config = load_config()
-    all_data = backend.load_all()
-    mood_series = [
-        {"date": d, "score": entry["mood"]}
-        for d, entry in all_data.items()
-        if "mood" in entry
-    ]
-    mood_series.sort(key=lambda x: x["date"])
+    """Habit bars and the mood line for ``?range=week|month|quarter|year|all``.
 
-    chart_data = []
-    for key, info in config.items():
-        bars = []
-        for day in week:
-            entry = data.get(str(day), {}).get(key)
-            val = entry.get("duration", 0) if isinstance(entry, dict) else 0
-            bars.append(val)
-        chart_data.append({"label": info["label"], "data": bars})
+    Bars are per day, week or month depending on the range and the mood
+    line is downsampled to ``MOOD_CHART_POINTS``, so the page stays the same
+    size however long the history is.
+    """
+    import analytics
 
-    labels = [d.strftime("%a") for d in week]
+    debug_mode = request.args.get("debug") == "true"
+    range_name = request.args.get("range", "week")
+    if range_name not in ANALYTICS_RANGES:
+        return {"status": "error", "message": "unknown range"}, 400
+    loader = request_data()
+    config = loader.config()
+    today = datetime.date.today()
+    start, end = analytics_range(range_name, today)
+    history = analytics.History.load(
+        loader.entries(str(start) if start else None, str(end)), config
+    )
+    last = end.toordinal()
+    if start is not None:
+        first = start.toordinal()
+    elif len(history.moods):
+        first = min(history.base, last)
+    else:
+        first = last
+
+    size = ANALYTICS_RANGES[range_name][1]
+    keys, totals = history.buckets(first, last, size)
+    chart_data = [
+        {"label": info["label"], "data": column}
+        for info, column in zip(config.values(), totals.T.tolist())
+    ]
+    labels = [bucket_label(key, size, range_name) for key in keys.tolist()]
+    mood_series = history.mood_series(first, last, points=MOOD_CHART_POINTS)
     return render_template(
         "analytics.html",
         chart_data=chart_data,
         labels=labels,
         mood_series=mood_series,
+        ranges=list(ANALYTICS_RANGES),
+        range_name=range_name,
         debug=debug_mode,
     )
 
 
+def year_heatmap(config: dict[str, dict], bits: dict[str, int], year: int):
+    """Per-habit heatmap rows for ``year`` from ``get_completion_bits``.
+
+    Weekly and monthly counts and the longest run come straight from the
+    bitset; ``hex`` is what the page draws the cells from.
+    """
+    first = datetime.date(year, 1, 1)
+    days = (datetime.date(year, 12, 31) - first).days + 1
+    lead = first.weekday()
+    weeks = (lead + days + 6) // 7
+    month_starts = [
+        (datetime.date(year, month, 1) - first).days for month in range(1, 13)
+    ] + [days]
+    rows = []
+    for key, info in config.items():
+        habit_bits = bits.get(key, 0)
+        # Shifted so bit 0 is the Monday the first grid column starts on.
+        aligned = habit_bits << lead
+        rows.append(
+            {
+                "key": key,
+                "label": info["label"],
+                "hex": format(habit_bits, "x"),
+                "total": habit_bits.bit_count(),
+                "longest": storage.longest_run(habit_bits),
+                "best_week": max(
+                    storage.count_bits(aligned, 7 * w, 7 * w + 7) for w in range(weeks)
+                ),
+                "months": [
+                    storage.count_bits(habit_bits, a, b)
+                    for a, b in zip(month_starts, month_starts[1:])
+                ],
+            }
+        )
+    return rows
+
+
+@app.route("/heatmap")
+@conditional
+def heatmap():
+    """GitHub-style year-at-a-glance view of every habit (``?year=YYYY``)."""
+    today = datetime.date.today()
+    try:
+        year = int(request.args.get("year", today.year))
+        first, last = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    except ValueError:
+        return {"status": "error", "message": "year must be YYYY"}, 400
+    loader = request_data()
+    config = loader.config()
+    bits = loader.fetch("get_completion_bits", tuple(config), str(first), str(last))
+    return render_template(
+        "heatmap.html",
+        year=year,
+        lead=first.weekday(),
+        days=(last - first).days + 1,
+        rows=year_heatmap(config, bits, year),
+        months=[datetime.date(year, m, 1).strftime("%b") for m in range(1, 13)],
+    )
+
+
 @app.route("/journal")
 def journal():
-    data = load_data()
-    base_prompt = generate_journal_prompt(data)
-    ai_prompt = enrich_prompt_with_ai(base_prompt)
-    return render_template("journal.html", prompt=ai_prompt)
+    """Serve the journal page without waiting on the AI.
+
+    A precomputed AI prompt is used when ready; otherwise the base prompt is
+    shown and the page polls ``/journal/prompt/<key>`` until it is.
+    ``?refresh=1`` regenerates the AI prompt instead of reusing the cache.
+    """
+    prompt = generate_journal_prompt(get_storage_backend().iter_entries())
+    pending_key = None
+    if ai_enabled():
+        key = prompt_key(prompt)
+        refresh = request.args.get("refresh") == "1"
+        enriched = None
+        if not refresh:
+            enriched = AI_PROMPTS.get(key) or cached_ai_prompt(prompt)
+        if enriched is None:
+            AI_PROMPTS.schedule(prompt, refresh=refresh)
+            pending_key = key
+        else:
+            prompt = enriched
+    return render_template("journal.html", prompt=prompt, pending_key=pending_key)
+
+
+@app.route("/journal/cache")
+def journal_cache_stats():
+    """Return AI prompt cache hit/miss counters as JSON."""
+    if PROMPT_CACHE is None:
+        return {"enabled": False}
+    return {"enabled": True, **PROMPT_CACHE.stats()}
+
+
+@app.route("/journal/ai-status")
+def journal_ai_status():
+    """Return the AI circuit breaker state and call counters as JSON."""
+    return AI_GUARD.stats()
+
+
+@app.route("/journal/prompt/<key>")
+def journal_prompt(key):
+    """Return the AI prompt fragment once ready (204 while it is pending)."""
+    enriched = AI_PROMPTS.get(key)
+    if enriched is not None:
+        return render_template("_journal_prompt.html", prompt=enriched)
+    if AI_PROMPTS.pending(key):
+        return "", 204
+    # Unknown job (e.g. after a restart): 286 tells htmx to stop polling.
+    return "", 286
+
+
+_journal_zip = {"stamp": None, "data": b"", "builds": 0}
+_journal_zip_lock = threading.Lock()
+
+
+def journal_zip(path: Path):
+    """Return ``(zip_bytes, stamp)`` for ``path``, built in memory.
+
+    The archive is cached and only rebuilt when the journal's path, mtime or
+    size changes; the lock makes concurrent first requests build it once.
+    """
+    with _journal_zip_lock:
+        st = path.stat()
+        stamp = (str(path), st.st_mtime_ns, st.st_size)
+        if _journal_zip["stamp"] != stamp:
+            from zipfile import ZipFile, ZIP_DEFLATED
+
+            buf = io.BytesIO()
+            with ZipFile(buf, "w", ZIP_DEFLATED) as zipf:
+                zipf.write(path, arcname=path.name)
+            _journal_zip.update(stamp=stamp, data=buf.getvalue())
+            _journal_zip["builds"] += 1
+        return _journal_zip["data"], stamp
 
 
 @app.route("/download-journal")
@@ -408,11 +1132,17 @@ def download_journal():
         return "No journal entries yet.", 404
 
     if format == "zip":
-        from zipfile import ZipFile
-        zip_path = Path("journal.zip")
-        with ZipFile(zip_path, "w") as zipf:
-            zipf.write(path)
-        return send_file(zip_path, as_attachment=True, mimetype="application/zip")
+        data, stamp = journal_zip(path)
+        # send_file handles If-None-Match, If-Modified-Since and Range.
+        return send_file(
+            io.BytesIO(data),
+            as_attachment=True,
+            download_name="journal.zip",
+            mimetype="application/zip",
+            etag=hashlib.sha1(repr(stamp).encode()).hexdigest()[:20],
+            last_modified=stamp[1] / 1e9,
+            max_age=0,
+        )
     else:
         return send_file(path, as_attachment=True, mimetype="text/plain")
 
@@ -421,34 +1151,369 @@ def download_journal():
 def save_journal():
     entry = request.form["entry"]
     today = datetime.date.today().isoformat()
-    with open(JOURNAL_FILE, "a") as f:
-        f.write(f"\n## {today}\n{entry.strip()}\n")
+    journal_store().append(today, entry)
     return redirect("/journal")
 
 
+JOURNAL_PAGE_SIZE = int(os.getenv("JOURNAL_PAGE_SIZE", "20"))
+_journal_stores = {}
+
+
+def journal_store() -> storage.JournalStore:
+    """Return the indexed store for the current ``JOURNAL_FILE``."""
+    path = Path(JOURNAL_FILE)
+    store = _journal_stores.get(path)
+    if store is None:
+        store = _journal_stores.setdefault(path, storage.JournalStore(path))
+    return store
+
+
 @app.route("/journal-history")
 def journal_history():
-    if not JOURNAL_FILE.exists():
-        return render_template("journal_history.html", entries=[])
+    """Show journal entries newest first, one page at a time.
 
-    with open(JOURNAL_FILE, "r") as f:
-        lines = f.readlines()
+    ``?page=N`` picks the page. htmx requests (infinite scroll) get only the
+    entries plus a sentinel that fetches the next page when revealed.
+    """
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    store = journal_store()
+    total = store.count()
+    pages = max(-(-total // JOURNAL_PAGE_SIZE), 1)
+    entries = store.entries((page - 1) * JOURNAL_PAGE_SIZE, JOURNAL_PAGE_SIZE)
+    template = (
+        "_journal_entries.html"
+        if request.headers.get("HX-Request")
+        else "journal_history.html"
+    )
+    return render_template(template, entries=entries, page=page, pages=pages)
 
-    entries = []
-    current = {"date": None, "text": ""}
 
-    for line in lines:
-        if line.startswith("## "):
-            if current["date"]:
-                entries.append(current)
-            current = {"date": line.replace("##", "").strip(), "text": ""}
-        else:
-            current["text"] += line
+@app.route("/search")
+def search():
+    """Search habit notes and journal entries: ``?q=<words>&limit=N``.
+
+    Every word must match (as a prefix). Notes come from the storage
+    backend's index and journal entries from the journal's sidecar index.
+    """
+    query = request.args.get("q", "").strip()
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    if not storage.search_terms(query):
+        return {"query": query, "notes": [], "journal": []}
+    return {
+        "query": query,
+        "notes": get_storage_backend().search_notes(query, limit),
+        "journal": journal_store().search(query, limit),
+    }
+
+
+# ── JSON API ────────────────────────────────────────────────────────────
+# Read-only endpoints under /api/v1 for clients that want data instead of
+# HTML. Every endpoint reads only the requested range from the backend,
+# leaves out empty days and answers 304 while the range is unchanged.
+
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "500"))
+API_MAX_PAGE = 5000
+API_MAX_DAYS = 366
+ENTRY_FIELDS = ("date", "habit", "duration", "note", "mood")
+STAT_FIELDS = (
+    "label", "streak", "longest", "total", "days", "avg_duration", "completion_rate"
+)
+
+
+def api_error(message: str, status: int = 400):
+    return {"status": "error", "message": message}, status
+
+
+def api_dates(default=None):
+    """Parse ``start``/``end`` into ISO strings; ``default`` fills both.
+
+    Raises ``ValueError`` with a client-facing message.
+    """
+    bounds = []
+    for i, name in enumerate(("start", "end")):
+        value = request.args.get(name)
+        try:
+            day = datetime.date.fromisoformat(value) if value else None
+        except ValueError:
+            raise ValueError(f"{name} must be YYYY-MM-DD") from None
+        if day is None and default is not None:
+            day = default[i]
+        bounds.append(str(day) if day else None)
+    if bounds[0] and bounds[1] and bounds[0] > bounds[1]:
+        raise ValueError("start must not be after end")
+    return bounds
+
+
+def api_fields(allowed):
+    """Return the ``fields=a,b`` selection (all of ``allowed`` by default)."""
+    value = request.args.get("fields")
+    if not value:
+        return allowed
+    fields = tuple(f.strip() for f in value.split(",") if f.strip())
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def api_limit():
+    try:
+        limit = int(request.args.get("limit", API_PAGE_SIZE))
+    except ValueError:
+        return API_PAGE_SIZE
+    return min(max(limit, 1), API_MAX_PAGE)
 
-    if current["date"]:
-        entries.append(current)
 
-    return render_template("journal_history.html", entries=entries[::-1])
+def entry_key(entry) -> tuple:
+    """Sort key of an ``iter_entries()`` row, as used by every backend."""
+    if isinstance(entry, storage.MoodEntry):
+        return (entry.date, 1, "")
+    return (entry.date, 0, entry.habit)
+
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        date, kind, habit = json.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        )
+        datetime.date.fromisoformat(date)
+        return (date, int(kind), str(habit))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor") from None
+
+
+def entry_page(loader: RequestData, start, end, kinds, cursor, limit):
+    """Return up to ``limit`` rows after ``cursor`` plus the next cursor.
+
+    The backend range query starts at the cursor's day, so each page only
+    reads what it returns (and the rest of that day).
+    """
+    after = decode_cursor(cursor) if cursor else None
+    if after and (start is None or after[0] > start):
+        start = after[0]
+    page = []
+    with closing(loader.entries(start, end, kinds)) as rows:
+        for entry in rows:
+            if after and entry_key(entry) <= after:
+                continue
+            if len(page) == limit:
+                return page, encode_cursor(entry_key(page[-1]))
+            page.append(entry)
+    return page, None
+
+
+def encode_entry(entry, fields) -> dict:
+    """Compact record for one row: empty notes and unselected fields are left out."""
+    if isinstance(entry, storage.MoodEntry):
+        record = {"date": entry.date, "mood": entry.score}
+    else:
+        record = {"date": entry.date, "habit": entry.habit, "duration": entry.duration}
+        if entry.note:
+            record["note"] = entry.note
+    return {k: v for k, v in record.items() if k in fields}
+
+
+def api_response(version_method: str, version_args: tuple, build):
+    """Serve ``build()`` as compact JSON behind a range-specific ETag.
+
+    The ETag covers the backend's version for the requested range (so edits
+    to other weeks do not invalidate it), the config file, today's date and
+    the URL; a matching ``If-None-Match`` gets a 304 without running
+    ``build``.
+    """
+    loader = request_data()
+    version = loader.fetch(version_method, *version_args)
+    etag = hashlib.sha1(
+        repr(
+            (
+                id(loader.backend),
+                version,
+                _config_stamp(),
+                str(datetime.date.today()),
+                request.full_path,
+            )
+        ).encode()
+    ).hexdigest()[:20]
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        body = json.dumps(build(), separators=(",", ":"), ensure_ascii=False)
+        response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def range_version(start, end):
+    """``api_response`` version source: the range's data version when bounded."""
+    if start and end:
+        return "get_data_version", (start, end)
+    return "get_last_write", ()
+
+
+@app.route("/api/v1/entries")
+def api_entries():
+    """Raw habit and mood rows, oldest first, ``limit`` at a time.
+
+    Query: ``start``, ``end``, ``kinds=habit,mood``, ``fields``, ``limit``
+    and ``cursor`` (the previous page's ``next_cursor``).
+    """
+    try:
+        start, end = api_dates()
+        fields = api_fields(ENTRY_FIELDS)
+        kinds = tuple(request.args.get("kinds", "habit,mood").split(","))
+        if not kinds or set(kinds) - set(storage.KINDS):
+            raise ValueError("kinds must be habit and/or mood")
+        cursor = request.args.get("cursor")
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        return api_error(str(e))
+    limit = api_limit()
+
+    def build():
+        page, next_cursor = entry_page(
+            request_data(), start, end, kinds, cursor, limit
+        )
+        return {
+            "entries": [encode_entry(e, fields) for e in page],
+            "next_cursor": next_cursor,
+        }
+
+    return api_response(*range_version(start, end), build)
+
+
+@app.route("/api/v1/mood")
+def api_mood():
+    """Mood series as ``[date, score]`` pairs with cursor pagination."""
+    try:
+        start, end = api_dates()
+        cursor = request.args.get("cursor")
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        return api_error(str(e))
+    limit = api_limit()
+
+    def build():
+        page, next_cursor = entry_page(
+            request_data(), start, end, ("mood",), cursor, limit
+        )
+        return {
+            "series": [[e.date, e.score] for e in page],
+            "next_cursor": next_cursor,
+        }
+
+    return api_response(*range_version(start, end), build)
+
+
+@app.route("/api/v1/grid")
+def api_grid():
+    """Habit grid for ``start``..``end`` (default: this week), empty days omitted.
+
+    ``fields`` picks from ``duration``, ``note`` and ``mood``; ``habits``
+    limits the habit keys. At most ``API_MAX_DAYS`` days per request.
+    """
+    week = get_week_range()
+    try:
+        start, end = api_dates(default=(week[0], week[-1]))
+        span = storage.to_day_number(end) - storage.to_day_number(start) + 1
+        if span > API_MAX_DAYS:
+            raise ValueError(f"range is limited to {API_MAX_DAYS} days")
+        fields = api_fields(("duration", "note", "mood"))
+    except ValueError as e:
+        return api_error(str(e))
+    habits = request.args.get("habits")
+    habits = set(habits.split(",")) if habits else None
+    kinds = tuple(
+        kind
+        for kind, wanted in (
+            ("habit", {"duration", "note"} & set(fields)),
+            ("mood", "mood" in fields),
+        )
+        if wanted
+    )
+
+    def build():
+        days = {}
+        with closing(request_data().entries(start, end, kinds)) as rows:
+            for entry in rows:
+                if isinstance(entry, storage.MoodEntry):
+                    days.setdefault(entry.date, {})["mood"] = entry.score
+                    continue
+                if habits is not None and entry.habit not in habits:
+                    continue
+                cell = {}
+                if "duration" in fields:
+                    cell["duration"] = entry.duration
+                if "note" in fields and entry.note:
+                    cell["note"] = entry.note
+                days.setdefault(entry.date, {})[entry.habit] = cell
+        return {"start": start, "end": end, "days": days}
+
+    return api_response("get_data_version", (start, end), build)
+
+
+@app.route("/api/v1/stats")
+def api_stats():
+    """Per-habit totals for ``start``..``end`` (default: this week) plus
+    current streaks and mood averages as of today.
+
+    ``fields`` picks the per-habit values.
+    """
+    import analytics
+
+    week = get_week_range()
+    try:
+        start, end = api_dates(default=(week[0], week[-1]))
+        fields = api_fields(STAT_FIELDS)
+    except ValueError as e:
+        return api_error(str(e))
+
+    def build():
+        loader = request_data()
+        config = loader.config()
+        today = str(datetime.date.today())
+        streaks = loader.fetch("get_streaks", tuple(config), today)
+        history = analytics.History.load(
+            loader.entries(start, end, ("habit",)), config
+        )
+        first, last = storage.to_day_number(start), storage.to_day_number(end)
+        totals = history.totals(first, last).tolist()
+        counts = history.counts(first, last).tolist()
+        averages = history.averages(first, last)
+        rates = history.completion_rates(first, last).tolist()
+        habits = {}
+        for i, (key, info) in enumerate(config.items()):
+            stat = {
+                "label": info["label"],
+                "streak": streaks[key]["streak"],
+                "longest": streaks[key]["longest"],
+                "total": totals[i],
+                "days": counts[i],
+                "avg_duration": averages[i],
+                "completion_rate": round(rates[i], 3),
+            }
+            habits[key] = {k: v for k, v in stat.items() if k in fields}
+        return {
+            "start": start,
+            "end": end,
+            "habits": habits,
+            "mood": loader.fetch("get_mood_summary", today),
+        }
+
+    # Streaks and mood averages reach outside the range, so any write counts.
+    return api_response("get_last_write", (), build)
 
 
 @app.route("/settings", methods=["GET", "POST"])
@@ -464,6 +1529,8 @@ def settings():
             )
         app.config["PWA_ENABLED"] = request.form.get("pwa_enabled") == "on"
         save_config(config)
+        # Cached pages embed labels and the PWA toggle.
+        request_data().write("touch")
         return render_template(
             "settings.html", config=config, message="✅ Settings saved."
         )
@@ -484,9 +1551,17 @@ if __name__ == "__main__":
         action="store_true",
         help="Enable Flask debug mode (overrides $DEBUG)"
     )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        default=os.getenv("WARM_TEMPLATES") == "1",
+        help="Compile all templates before serving (or set WARM_TEMPLATES=1)"
+    )
     args = parser.parse_args()
 
     create_app(args.mode)
+    if args.warm:
+        warm_templates()
 
     env_debug = os.getenv("DEBUG", "").lower() in {"1", "true", "yes"}
     debug = args.debug or env_debug or app.config.get("DEBUG", False)
@@ -81,6 +81,53 @@ def mood(score: int = typer.Argument(..., min=1, max=5)) -> None:
     typer.echo(f"🧠 Mood logged as {score}/5 for today.")
 
 
+@app.command("import")
+def import_entries(path: str) -> None:
+    """
+    Bulk-import habit/mood records from a JSON array or NDJSON file.
+    Example: python habit.py import backfill.ndjson
+    """
+    import storage
+
+    with open(path) as f:
+        try:
+            entries = storage.parse_entries(f.read())
+            count = storage.get_backend(json_path=DATA_FILE).import_entries(entries)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+
+    typer.echo(f"📥 Imported {count} record(s).")
+
+
+@app.command("rebuild-streaks")
+def rebuild_streaks() -> None:
+    """
+    Recompute the stored streak index from the habit log.
+    Example: python habit.py rebuild-streaks
+    """
+    import storage
+
+    storage.get_backend(json_path=DATA_FILE).rebuild_streaks()
+    typer.echo("🔁 Streak index rebuilt.")
+
+
+@app.command("verify-aggregates")
+def verify_aggregates() -> None:
+    """
+    Cross-check the stored mood averages against a full recompute.
+    Example: python habit.py verify-aggregates
+    """
+    import storage
+
+    backend = storage.get_backend(json_path=DATA_FILE)
+    stored = backend.get_mood_summary()
+    expected = backend.get_mood_summary(verify=True)
+    if stored != expected:
+        typer.echo(f"⚠️ Mood aggregates drifted: {stored} != {expected} (repaired)")
+        raise typer.Exit(1)
+    typer.echo("✅ Mood aggregates match a full recompute.")
+
+
 @app.command()
 def show() -> None:
     """
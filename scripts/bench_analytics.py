@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""Benchmark the columnar analytics against the per-entry Python loops.
+
+Builds a synthetic history (10 years × 50 habits by default), then times
+the habit and mood stats plus weekly/monthly totals both ways and checks
+they agree. Run from the repo root:
+
+    python scripts/bench_analytics.py [--years 10] [--habits 50]
+"""
+
+import argparse
+import datetime
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import analytics  # noqa: E402
+import storage  # noqa: E402
+
+
+def make_history(years, habits, seed=1):
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    data = {}
+    for offset in range(years * 365):
+        day = today - datetime.timedelta(days=offset)
+        info = {
+            f"h{i}": {"duration": rng.randint(1, 60), "note": ""}
+            for i in range(habits)
+            if rng.random() < 0.7
+        }
+        if rng.random() < 0.9:
+            info["mood"] = rng.randint(1, 5)
+        data[str(day)] = info
+    config = {f"h{i}": {"label": f"Habit {i}"} for i in range(habits)}
+    return data, config
+
+
+def python_habit_stats(data, config, week, today):
+    """The previous single-pass loop from ``app.calculate_habit_stats``."""
+    today_num = today.toordinal()
+    week_days = {str(day) for day in week}
+    totals = {key: [0, 0] for key in config}
+    runs = {key: [0, None] for key in config}
+    for entry in storage.iter_dict_entries(data, kinds=("habit",)):
+        if entry.habit not in config or not entry.duration:
+            continue
+        if entry.date in week_days:
+            totals[entry.habit][0] += entry.duration
+            totals[entry.habit][1] += 1
+        day = storage.to_day_number(entry.date)
+        if day > today_num:
+            continue
+        run = runs[entry.habit]
+        run[0] = run[0] + 1 if run[1] == day - 1 else 1
+        run[1] = day
+    stats = {}
+    for key in config:
+        total, count = totals[key]
+        length, last = runs[key]
+        stats[key] = {
+            "streak": length if last == today_num else 0,
+            "avg_duration": round(total / count, 1) if count else 0,
+        }
+    return stats
+
+
+def python_mood_stats(data, today):
+    moods = [
+        e
+        for e in storage.iter_dict_entries(data, kinds=("mood",))
+        if isinstance(e.score, int)
+    ]
+    return storage.summarize_moods(moods, today)
+
+
+def python_monthly_totals(data, config):
+    """Per-day ``data.get(str(day), {}).get(key)`` lookups, month by month."""
+    days = sorted(data)
+    first = datetime.date.fromisoformat(days[0])
+    last = datetime.date.fromisoformat(days[-1])
+    totals = {}
+    day = first
+    while day <= last:
+        month = totals.setdefault((day.year, day.month), dict.fromkeys(config, 0))
+        for key in config:
+            entry = data.get(str(day), {}).get(key)
+            if isinstance(entry, dict):
+                month[key] += entry.get("duration") or 0
+        day += datetime.timedelta(days=1)
+    return totals
+
+
+def columnar(data, config, week, today):
+    history = analytics.History.load(data, config)
+    start, end = week[0].toordinal(), week[-1].toordinal()
+    averages = history.averages(start, end)
+    streaks, _ = history.streaks(today.toordinal())
+    habit_stats = {
+        key: {"streak": int(streaks[i]), "avg_duration": averages[i]}
+        for i, key in enumerate(config)
+    }
+    mood = history.mood_summary(today.toordinal())
+    months, totals = history.monthly_totals(history.base, history.end - 1)
+    return habit_stats, mood, (months, totals)
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--habits", type=int, default=50)
+    args = parser.parse_args()
+
+    data, config = make_history(args.years, args.habits)
+    today = datetime.date.today()
+    monday = today - datetime.timedelta(days=today.weekday())
+    week = [monday + datetime.timedelta(days=i) for i in range(7)]
+
+    def python_all():
+        return (
+            python_habit_stats(data, config, week, today),
+            python_mood_stats(data, today),
+            python_monthly_totals(data, config),
+        )
+
+    slow, (habit_stats, mood, months) = timed(python_all)
+    fast, (np_habit_stats, np_mood, np_months) = timed(
+        columnar, data, config, week, today
+    )
+    assert habit_stats == np_habit_stats, "habit stats differ"
+    assert mood == np_mood, "mood stats differ"
+    month_keys, month_totals = np_months
+    assert list(months) == [(m // 12, m % 12 + 1) for m in month_keys.tolist()]
+    assert [list(m.values()) for m in months.values()] == month_totals.tolist()
+
+    history = analytics.History.load(data, config)
+    load, _ = timed(analytics.History.load, data, config)
+    query, _ = timed(lambda: columnar_queries(history, week, today))
+
+    print(f"{len(data)} days × {len(config)} habits, {len(months)} months")
+    print(f"python loops : {slow * 1000:8.1f} ms")
+    print(f"columnar     : {fast * 1000:8.1f} ms  ({slow / fast:.1f}× faster)")
+    print(f"  load       : {load * 1000:8.1f} ms")
+    print(f"  aggregates : {query * 1000:8.1f} ms")
+
+
+def columnar_queries(history, week, today):
+    start, end = week[0].toordinal(), week[-1].toordinal()
+    history.averages(start, end)
+    history.streaks(today.toordinal())
+    history.mood_summary(today.toordinal())
+    history.monthly_totals(history.base, history.end - 1)
+
+
+if __name__ == "__main__":
+    main()
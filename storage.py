@@ -1,21 +1,821 @@
 import os
+import re
 import json
+import hashlib
+import bisect
+import itertools
+from array import array
 import sqlite3
 import datetime
 import logging
+import threading
+import sys
+import time
 from pathlib import Path
-from contextlib import closing
+from collections import namedtuple
+from collections.abc import Mapping
+from contextlib import closing, contextmanager
+
+
+# Version of the SQL schema; see SQLiteBackend._init_schema and
+# PostgresBackend._init_schema for the upgrade steps.
+SCHEMA_VERSION = 7
+
+
+# Typed rows yielded by ``iter_entries``; dates are ISO strings.
+HabitEntry = namedtuple("HabitEntry", "date habit duration note")
+MoodEntry = namedtuple("MoodEntry", "date score")
+KINDS = ("habit", "mood")
+
+
+def iter_dict_entries(data, start=None, end=None, kinds=KINDS):
+    """Yield typed rows from a ``load_all()``-style dict in date order.
+
+    Within a day habits come first (by key), then the mood. Keys that are not
+    ISO dates and legacy non-dict habit values are skipped.
+    """
+    for date in sorted(data):
+        if (start and date < start) or (end and date > end):
+            continue
+        try:
+            datetime.date.fromisoformat(date)
+        except ValueError:
+            continue
+        info = data[date]
+        if not isinstance(info, Mapping):
+            continue
+        if "habit" in kinds:
+            for habit in sorted(k for k in info if k != "mood"):
+                entry = info[habit]
+                if isinstance(entry, Mapping):
+                    yield HabitEntry(
+                        date, habit, entry.get("duration"), entry.get("note", "")
+                    )
+        if "mood" in kinds and "mood" in info:
+            yield MoodEntry(date, info["mood"])
+
+
+def to_day_number(date):
+    """Return the proleptic ordinal of an ISO date string (or ``date``)."""
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return date.toordinal()
+
+
+def from_day_number(day):
+    """Return the ISO date string for a day number."""
+    return datetime.date.fromordinal(day).isoformat()
+
+
+def week_of(day):
+    """Return the day number of the Monday starting ``day``'s week."""
+    # Ordinal 1 (0001-01-01) is a Monday.
+    return day - (day - 1) % 7
+
+
+def _upgrade_rows(rows):
+    """Yield legacy ``(date_text, ...)`` rows with integer day numbers."""
+    for date, *rest in rows:
+        try:
+            day = to_day_number(date)
+        except (TypeError, ValueError):
+            logging.warning("Dropping row with invalid date %r during upgrade", date)
+            continue
+        yield (day, *rest)
+
+
+def plan_run_update(runs, day, done):
+    """Return ``(drop, add)`` run lists after marking ``day`` done/undone.
+
+    ``runs`` are the ``(start, end)`` day-number runs of one habit that touch
+    ``day - 1 .. day + 1``. Completing a day can join the runs on either side
+    into one; clearing a day inside a run splits it in two.
+    """
+    containing = [r for r in runs if r[0] <= day <= r[1]]
+    if done:
+        if containing:
+            return [], []
+        left = [r for r in runs if r[1] == day - 1]
+        right = [r for r in runs if r[0] == day + 1]
+        start = left[0][0] if left else day
+        end = right[0][1] if right else day
+        return left + right, [(start, end)]
+    if not containing:
+        return [], []
+    start, end = containing[0]
+    add = []
+    if start < day:
+        add.append((start, day - 1))
+    if day < end:
+        add.append((day + 1, end))
+    return containing, add
+
+
+def runs_from_days(days):
+    """Collapse sorted day numbers into ``(start, end)`` runs."""
+    runs = []
+    for day in days:
+        if runs and day <= runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], max(runs[-1][1], day))
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def streak_summary(current, longest, last):
+    """Shape one habit's entry in ``get_streaks`` results."""
+    return {
+        "streak": current,
+        "longest": longest,
+        "last_completed": from_day_number(last) if last else None,
+    }
+
+
+class StreakIndex:
+    """In-memory runs of consecutive completed days per habit.
+
+    A day counts as completed when its entry has a non-zero duration, which
+    matches ``calculate_habit_stats``. Runs are kept sorted per habit so the
+    run covering a day is found with ``bisect``.
+    """
+
+    def __init__(self):
+        self._runs = {}
+        self._longest = {}
+
+    @classmethod
+    def from_data(cls, data):
+        index = cls()
+        days = {}
+        for entry in iter_dict_entries(data, kinds=("habit",)):
+            if entry.duration:
+                days.setdefault(entry.habit, []).append(to_day_number(entry.date))
+        for habit, habit_days in days.items():
+            runs = runs_from_days(habit_days)
+            index._runs[habit] = runs
+            index._longest[habit] = max(e - s + 1 for s, e in runs)
+        return index
+
+    def _touching(self, habit, day):
+        runs = self._runs.get(habit, [])
+        i = bisect.bisect_right(runs, (day + 1, float("inf")))
+        return [r for r in runs[max(i - 2, 0):i] if r[1] >= day - 1]
+
+    def mark(self, habit, day, done):
+        drop, add = plan_run_update(self._touching(habit, day), day, done)
+        runs = self._runs.setdefault(habit, [])
+        for run in drop:
+            runs.remove(run)
+        for run in add:
+            bisect.insort(runs, run)
+        longest = self._longest.get(habit, 0)
+        if any(e - s + 1 == longest for s, e in drop):
+            longest = max((e - s + 1 for s, e in runs), default=0)
+        for s, e in add:
+            longest = max(longest, e - s + 1)
+        self._longest[habit] = longest
+
+    def apply(self, record):
+        """Update the index for one JSON write-ahead record."""
+        op = record.get("op")
+        if op == "habit":
+            day = to_day_number(record["date"])
+            self.mark(record["habit"], day, bool(record["duration"]))
+        elif op == "delete":
+            self.mark(record["habit"], to_day_number(record["date"]), False)
+
+    def stats(self, habit, today):
+        runs = self._runs.get(habit, [])
+        i = bisect.bisect_right(runs, (today, float("inf")))
+        current = 0
+        if i and runs[i - 1][1] >= today:
+            current = today - runs[i - 1][0] + 1
+        last = runs[-1][1] if runs else None
+        return streak_summary(current, self._longest.get(habit, 0), last)
+
+
+def bits_from_runs(runs, start, end):
+    """Return the completion bitset of ``start..end`` from day-number runs.
+
+    Bit ``i`` is set when day ``start + i`` falls inside one of ``runs``.
+    """
+    bits = 0
+    for first, last in runs:
+        first, last = max(first, start), min(last, end)
+        if first <= last:
+            bits |= ((1 << (last - first + 1)) - 1) << (first - start)
+    return bits
+
+
+def count_bits(bits, first, stop):
+    """Count the set bits at offsets ``first`` up to (excluding) ``stop``."""
+    return ((bits >> first) & ((1 << max(stop - first, 0)) - 1)).bit_count()
+
+
+def longest_run(bits):
+    """Return the length of the longest run of set bits.
+
+    Each ``bits & (bits >> 1)`` shortens every run by one, so this takes as
+    many steps as the longest run.
+    """
+    length = 0
+    while bits:
+        bits &= bits >> 1
+        length += 1
+    return length
+
+
+class CompletionBits:
+    """Per-habit completion bitsets for the JSON backend.
+
+    Bit ``i`` of ``bits[habit]`` is set when the habit was done (non-zero
+    duration) on day ``base + i``; a year of one habit is 46 bytes.
+    """
+
+    def __init__(self):
+        self.base = None
+        self.bits = {}
+
+    @classmethod
+    def from_data(cls, data):
+        index = cls()
+        for entry in iter_dict_entries(data, kinds=("habit",)):
+            if entry.duration:
+                index.mark(entry.habit, to_day_number(entry.date), True)
+        return index
+
+    def mark(self, habit, day, done):
+        if self.base is None:
+            self.base = day
+        if day < self.base:
+            shift = self.base - day
+            self.bits = {key: bits << shift for key, bits in self.bits.items()}
+            self.base = day
+        bit = 1 << (day - self.base)
+        bits = self.bits.get(habit, 0)
+        self.bits[habit] = bits | bit if done else bits & ~bit
+
+    def apply(self, record):
+        """Update the bitsets for one JSON write-ahead record."""
+        op = record.get("op")
+        if op == "habit":
+            day = to_day_number(record["date"])
+            self.mark(record["habit"], day, bool(record["duration"]))
+        elif op == "delete":
+            self.mark(record["habit"], to_day_number(record["date"]), False)
+
+    def window(self, habit, start, end):
+        """Return ``habit``'s bits for ``start..end`` with bit 0 at ``start``."""
+        bits = self.bits.get(habit, 0)
+        if not bits or end < start:
+            return 0
+        shift = start - self.base
+        bits = bits >> shift if shift >= 0 else bits << -shift
+        return bits & ((1 << (end - start + 1)) - 1)
+
+
+def _average(total, count):
+    return round(total / count, 1) if count else 0
+
+
+def mood_windows(today):
+    """Return the first day numbers of the 7- and 30-day mood windows."""
+    return today - 6, today - 29
+
+
+def summarize_moods(entries, today):
+    """Full recompute of the mood averages from ``MoodEntry`` rows.
+
+    Windows are open-ended like ``calculate_mood_stats``: any day on or
+    after the window start counts.
+    """
+    week_start, month_start = mood_windows(to_day_number(today))
+    sums = [0, 0, 0, 0, 0, 0]  # week, 30 days, overall: (total, count) each
+    for entry in entries:
+        if not isinstance(entry.score, int):
+            continue
+        day = to_day_number(entry.date)
+        for i, start in enumerate((week_start, month_start, None)):
+            if start is None or day >= start:
+                sums[2 * i] += entry.score
+                sums[2 * i + 1] += 1
+    return {
+        "weekly_avg": _average(sums[0], sums[1]),
+        "30d_avg": _average(sums[2], sums[3]),
+        "overall_avg": _average(sums[4], sums[5]),
+    }
+
+
+class MoodIndex:
+    """Running mood totals plus a per-day score array for rolling windows.
+
+    ``scores[i]`` holds the mood of day ``base + i`` (``EMPTY`` when none),
+    so a window is a short slice and the overall average is O(1).
+    """
+
+    EMPTY = -32768
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+        self.base = None
+        self.scores = array("h")
+
+    @classmethod
+    def from_data(cls, data):
+        index = cls()
+        for entry in iter_dict_entries(data, kinds=("mood",)):
+            index.set(to_day_number(entry.date), entry.score)
+        return index
+
+    def _slot(self, day):
+        if self.base is None:
+            self.base = day
+        if day < self.base:
+            self.scores[0:0] = array("h", [self.EMPTY]) * (self.base - day)
+            self.base = day
+        i = day - self.base
+        if i >= len(self.scores):
+            self.scores.extend([self.EMPTY] * (i + 1 - len(self.scores)))
+        return i
+
+    def set(self, day, score):
+        i = self._slot(day)
+        old = self.scores[i]
+        if old != self.EMPTY:
+            self.total -= old
+            self.count -= 1
+        if isinstance(score, int) and -32768 < score < 32768:
+            self.scores[i] = score
+            self.total += score
+            self.count += 1
+        else:
+            self.scores[i] = self.EMPTY
+
+    def apply(self, record):
+        """Update the index for one JSON write-ahead record."""
+        if record.get("op") == "mood":
+            self.set(to_day_number(record["date"]), record["score"])
+
+    def window(self, start):
+        if self.base is None:
+            return 0, 0
+        tail = [s for s in self.scores[max(start - self.base, 0):] if s != self.EMPTY]
+        return sum(tail), len(tail)
+
+    def summary(self, today):
+        week_start, month_start = mood_windows(to_day_number(today))
+        return {
+            "weekly_avg": _average(*self.window(week_start)),
+            "30d_avg": _average(*self.window(month_start)),
+            "overall_avg": _average(self.total, self.count),
+        }
+
+
+_VERSIONS = itertools.count(1)
+
+
+class WeekVersions:
+    """Per-week data versions for the JSON backend.
+
+    Versions come from one process-wide counter, so an instance rebuilt
+    after the cached parse is replaced (e.g. by an external write) never
+    hands out a number seen before.
+    """
+
+    def __init__(self):
+        self.base = next(_VERSIONS)
+        self.weeks = {}
+
+    @classmethod
+    def from_data(cls, data):
+        return cls()
+
+    def apply(self, record):
+        """Bump the week touched by one JSON write-ahead record."""
+        self.weeks[week_of(to_day_number(record["date"]))] = next(_VERSIONS)
+
+    def version(self, first, last):
+        return sum(
+            self.weeks.get(week, self.base)
+            for week in range(week_of(first), last + 1, 7)
+        )
+
+
+def search_terms(text):
+    """Return the lowercase word tokens of ``text`` (used for search)."""
+    return re.findall(r"\w+", text.lower())
+
+
+def highlight(text, query, width=80):
+    """Return a window of ``text`` around the first match, terms in [brackets]."""
+    terms = search_terms(query)
+    if not terms:
+        return text[:width]
+    pattern = re.compile(
+        r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE
+    )
+    match = pattern.search(text)
+    start = max(match.start() - width // 3, 0) if match else 0
+    window = text[start:start + width]
+    snippet = pattern.sub(lambda m: f"[{m.group(0)}]", window)
+    return ("…" if start else "") + snippet + ("…" if start + width < len(text) else "")
+
+
+class NoteIndex:
+    """Inverted index of habit notes for the JSON backend.
+
+    ``postings`` maps each token to the ``(date, habit)`` pairs whose note
+    contains it and ``docs`` the reverse, so a rewritten note can be
+    unindexed without its old text. Queries match every term as a prefix.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}
+        self.dirty = False
+
+    @classmethod
+    def from_data(cls, data):
+        index = cls()
+        for entry in iter_dict_entries(data, kinds=("habit",)):
+            index.set(entry.date, entry.habit, entry.note)
+        return index
+
+    def set(self, date, habit, note):
+        """Index ``note`` for ``(date, habit)``, replacing any previous note."""
+        doc = (date, habit)
+        for term in self.docs.pop(doc, ()):
+            docs = self.postings[term]
+            docs.discard(doc)
+            if not docs:
+                del self.postings[term]
+        terms = set(search_terms(note or ""))
+        if terms:
+            self.docs[doc] = terms
+            for term in terms:
+                self.postings.setdefault(term, set()).add(doc)
+        self.dirty = True
+
+    def apply(self, record):
+        """Update the index for one JSON write-ahead record."""
+        op = record.get("op")
+        if op == "habit":
+            self.set(record["date"], record["habit"], record.get("note"))
+        elif op == "delete":
+            self.set(record["date"], record["habit"], None)
+
+    def search(self, query):
+        """Return ``(date, habit)`` pairs matching every term, newest first."""
+        found = None
+        for term in search_terms(query):
+            docs = set()
+            for token, postings in self.postings.items():
+                if token.startswith(term):
+                    docs |= postings
+            found = docs if found is None else found & docs
+            if not found:
+                return []
+        return sorted(found or (), reverse=True)
+
+    def dump(self):
+        return {term: sorted(docs) for term, docs in self.postings.items()}
+
+    @classmethod
+    def load(cls, postings):
+        index = cls()
+        for term, docs in postings.items():
+            index.postings[term] = {tuple(doc) for doc in docs}
+            for doc in index.postings[term]:
+                index.docs.setdefault(doc, set()).add(term)
+        return index
+
+
+class HabitRecord(Mapping):
+    """One habit entry of a ``CompactHistory``.
+
+    Reads like the ``{"duration": ..., "note": ...}`` dict of ``load_all``;
+    the note is only fetched when asked for.
+    """
+
+    __slots__ = ("_history", "_row")
+
+    def __init__(self, history, row):
+        self._history = history
+        self._row = row
+
+    @property
+    def duration(self):
+        return self._history.durations[self._row]
+
+    @property
+    def note(self):
+        return self._history.note(self._row)
+
+    def __getitem__(self, key):
+        if key == "duration":
+            return self.duration
+        if key == "note":
+            return self.note
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("duration", "note"))
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return f"HabitRecord(duration={self.duration!r})"
+
+
+class DayView(Mapping):
+    """One day of a ``CompactHistory``, read like a ``load_all()`` day dict."""
+
+    __slots__ = ("_history", "_lo", "_hi", "_mood")
+
+    def __init__(self, history, lo, hi, mood):
+        self._history = history
+        self._lo = lo
+        self._hi = hi
+        self._mood = mood
+
+    def _row(self, habit):
+        history = self._history
+        habit_id = history.habit_ids_by_name.get(habit)
+        if habit_id is not None:
+            for row in range(self._lo, self._hi):
+                if history.habit_ids[row] == habit_id:
+                    return row
+        return None
+
+    def __getitem__(self, key):
+        if key == "mood" and self._mood is not None:
+            return self._mood
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        return HabitRecord(self._history, row)
+
+    def __iter__(self):
+        history = self._history
+        for row in range(self._lo, self._hi):
+            yield history.habits[history.habit_ids[row]]
+        if self._mood is not None:
+            yield "mood"
+
+    def __len__(self):
+        return self._hi - self._lo + (self._mood is not None)
+
+
+class CompactHistory(Mapping):
+    """Column-oriented history that reads like ``load_all()``.
+
+    Habit entries are parallel arrays sorted by day then habit: day numbers
+    (``array('i')``), interned habit ids (``array('H')``) and durations
+    (``array('H')``, widened only if a value does not fit). Moods are two
+    more arrays. Notes live outside the columns and come from
+    ``note_loader(day, habit)`` on first access, so a long history costs a
+    few bytes per entry instead of a dict per day and per entry.
+
+    ``history["2025-06-19"]`` is a ``DayView`` and entries are
+    ``HabitRecord``s, both read-only ``Mapping``s. That keeps templates and
+    ``data.get(day, {}).get(habit)`` lookups working.
+    """
+
+    def __init__(self, note_loader=None):
+        self.days = array("i")
+        self.habit_ids = array("H")
+        self.durations = array("H")
+        self.mood_days = array("i")
+        self.mood_scores = array("b")
+        self.habits = []
+        self.habit_ids_by_name = {}
+        self._note_loader = note_loader or (lambda day, habit: "")
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build from a date-ordered ``iter_entries()`` stream.
+
+        Non-empty notes are kept in a side table keyed by day and habit.
+        """
+        notes = {}
+        history = cls(lambda day, habit: notes.get((day, habit), ""))
+        for entry in entries:
+            day = to_day_number(entry.date)
+            if isinstance(entry, HabitEntry):
+                habit = history.add_habit(day, entry.habit, entry.duration)
+                if entry.note:
+                    notes[(day, habit)] = entry.note
+            else:
+                history.add_mood(day, entry.score)
+        return history
+
+    def add_habit(self, day, habit, duration):
+        """Append one habit entry (in day, habit order); return the interned name."""
+        habit_id = self.habit_ids_by_name.get(habit)
+        if habit_id is None:
+            habit = sys.intern(habit)
+            habit_id = self.habit_ids_by_name[habit] = len(self.habits)
+            self.habits.append(habit)
+        self.days.append(day)
+        self.habit_ids.append(habit_id)
+        try:
+            self.durations.append(duration or 0)
+        except OverflowError:
+            self.durations = array("l", self.durations)
+            self.durations.append(duration)
+        return self.habits[habit_id]
+
+    def add_mood(self, day, score):
+        """Append one mood (in day order)."""
+        self.mood_days.append(day)
+        self.mood_scores.append(score)
+
+    def note(self, row):
+        return self._note_loader(self.days[row], self.habits[self.habit_ids[row]])
+
+    def _view(self, day):
+        lo = bisect.bisect_left(self.days, day)
+        hi = bisect.bisect_right(self.days, day, lo)
+        i = bisect.bisect_left(self.mood_days, day)
+        has_mood = i < len(self.mood_days) and self.mood_days[i] == day
+        if lo == hi and not has_mood:
+            return None
+        return DayView(self, lo, hi, self.mood_scores[i] if has_mood else None)
+
+    def __getitem__(self, date):
+        try:
+            view = self._view(to_day_number(date))
+        except (TypeError, ValueError):
+            view = None
+        if view is None:
+            raise KeyError(date)
+        return view
+
+    def _day_numbers(self):
+        days = itertools.chain(
+            (d for d, _ in itertools.groupby(self.days)), self.mood_days
+        )
+        return sorted(set(days))
+
+    def __iter__(self):
+        return (from_day_number(day) for day in self._day_numbers())
+
+    def __len__(self):
+        return len(self._day_numbers())
+
+
+def parse_entries(text):
+    """Parse import data given as a JSON array or newline-delimited JSON."""
+    text = text.strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def normalize_entries(entries):
+    """Validate import records and split them into habit and mood rows.
+
+    Habit records look like ``{"date", "habit", "duration", "note"}`` and mood
+    records like ``{"date", "mood"}``. Later records win over earlier ones for
+    the same day/habit. Raises ``ValueError`` naming the offending record.
+    """
+    habits = {}
+    moods = {}
+    for i, entry in enumerate(entries):
+        try:
+            date = str(datetime.date.fromisoformat(entry["date"]))
+            if "habit" in entry:
+                duration = entry["duration"]
+                if isinstance(duration, bool) or not isinstance(duration, int):
+                    raise ValueError("duration must be an integer")
+                note = entry.get("note") or ""
+                habits[(date, str(entry["habit"]))] = (int(duration), str(note))
+            elif "mood" in entry:
+                score = entry["mood"]
+                if (
+                    isinstance(score, bool)
+                    or not isinstance(score, int)
+                    or not 1 <= score <= 5
+                ):
+                    raise ValueError("mood must be an integer from 1 to 5")
+                moods[date] = score
+            else:
+                raise ValueError("expected a 'habit' or 'mood' field")
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"record {i}: {e}") from None
+    habit_rows = [(d, h, dur, note) for (d, h), (dur, note) in habits.items()]
+    mood_rows = list(moods.items())
+    return habit_rows, mood_rows
 
 
 class JSONBackend:
-    """Simple JSON file backend compatible with existing CLI data."""
+    """Simple JSON file backend compatible with existing CLI data.
+
+    With ``journal=True`` each mutation is appended as one JSON line to a
+    write-ahead log next to the snapshot (``<file>.wal``) instead of
+    rewriting the whole file. Reads replay the log over the snapshot and the
+    log is folded back into the snapshot every ``compact_every`` records.
+
+    Parsed data is cached in-process and revalidated against the
+    ``(mtime_ns, size, inode)`` of the snapshot and log files, so repeat reads
+    skip parsing until this backend or an external writer (e.g. the CLI)
+    touches the files. The returned structures are shared with the cache and
+    must be treated as read-only. ``cache_hits``/``cache_misses`` count
+    lookups.
+    """
 
     FILE = Path.home() / ".habit_log.json"
+    COMPACT_EVERY = 500
 
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, journal=False, compact_every=None):
         self.file = Path(file_path) if file_path else self.FILE
+        self.wal = self.file.with_name(self.file.name + ".wal")
+        self.journal = journal
+        self.compact_every = compact_every or self.COMPACT_EVERY
+        self._wal_records = None
+        self._cache = None
+        self._cache_stamp = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._touches = 0
+        # Structures derived from the cached parse (see _index/_track).
+        self._indexes = {}
+        self._indexes_for = None
+
+    # ---- read cache ------------------------------------------------------
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _stamp(self):
+        return (
+            self._stat(self.file),
+            self._stat(self.wal),
+            self._stat(self._compacting_path()),
+        )
+
+    def _remember(self, data):
+        self._cache = data
+        self._cache_stamp = self._stamp()
+
+    def invalidate(self):
+        """Drop the cached parse so the next read goes to disk."""
+        self._cache = None
+        self._cache_stamp = None
+
+    def _index(self, name, build):
+        """Return derived index ``name`` for the current data.
+
+        Indexes are rebuilt with ``build(data)`` whenever the cached parse is
+        replaced (an external write or a compaction) and are otherwise
+        updated record by record in ``_track``.
+        """
+        data = self._load()
+        if self._indexes_for is not data:
+            self._indexes = {}
+            self._indexes_for = data
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes[name] = build(data)
+        return index
+
+    def _track(self, record):
+        if self._indexes_for is not None and self._indexes_for is self._cache:
+            for index in self._indexes.values():
+                index.apply(record)
 
     def _load(self):
+        stamp = self._stamp()
+        if self._cache is not None and stamp == self._cache_stamp:
+            self.cache_hits += 1
+            return self._cache
+        self.cache_misses += 1
+        data = self._read()
+        self._cache = data
+        self._cache_stamp = stamp
+        return data
+
+    def _read(self):
+        data = self._load_snapshot()
+        # A leftover ``.compacting`` log means a compaction was interrupted;
+        # replaying it before the live log is safe because records are
+        # absolute assignments.
+        count = self._replay(data, self._compacting_path())
+        self._wal_records = self._replay(data, self.wal)
+        if count:
+            self._wal_records += count
+        return data
+
+    def _load_snapshot(self):
         if self.file.exists():
             try:
                 with open(self.file) as f:
@@ -25,26 +825,187 @@ class JSONBackend:
         return {}
 
     def _save(self, data):
+        self.invalidate()
         with open(self.file, "w") as f:
             json.dump(data, f, indent=2)
+        # The snapshot now holds everything the log did.
+        self._drop_log(self.wal)
+        self._drop_log(self._compacting_path())
+        self._wal_records = 0
+        self._remember(data)
+
+    # ---- write-ahead log -------------------------------------------------
+
+    def _compacting_path(self):
+        return self.wal.with_name(self.wal.name + ".compacting")
+
+    @staticmethod
+    def _drop_log(path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _apply(data, record):
+        """Apply one log record to ``data`` in place."""
+        op = record.get("op")
+        date = record.get("date")
+        if op == "habit":
+            data.setdefault(date, {})[record["habit"]] = {
+                "duration": record["duration"],
+                "note": record.get("note", ""),
+            }
+        elif op == "delete":
+            data.get(date, {}).pop(record["habit"], None)
+        elif op == "mood":
+            data.setdefault(date, {})["mood"] = record["score"]
+
+    def _replay(self, data, path):
+        """Replay the log at ``path`` onto ``data``; return records applied."""
+        if not path.exists():
+            return 0
+        count = 0
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn trailing write from a crash; skip it.
+                    continue
+                self._apply(data, record)
+                count += 1
+        return count
+
+    def _append(self, record):
+        cached = self._cache if self._cache_stamp == self._stamp() else None
+        self.invalidate()
+        if self._wal_records is None:
+            self._wal_records = self._count_records()
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with open(self.wal, "ab+") as f:
+            # Start on a fresh line if a crash left a torn record behind.
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+            f.write(line.encode())
+        self._wal_records += 1
+        if self._wal_records >= self.compact_every:
+            self.compact()
+        elif cached is not None:
+            # Keep the cache warm: it already matched disk before this record.
+            self._apply(cached, record)
+            self._remember(cached)
+            self._track(record)
+
+    def _count_records(self):
+        if not self.wal.exists():
+            return 0
+        with open(self.wal, "rb") as f:
+            return sum(1 for _ in f)
+
+    def _write(self, record):
+        if self.journal:
+            self._append(record)
+        else:
+            data = self._load()
+            self._apply(data, record)
+            self._save(data)
+            self._track(record)
+
+    def compact(self):
+        """Fold the write-ahead log back into the snapshot."""
+        self.invalidate()
+        compacting = self._compacting_path()
+        if self.wal.exists():
+            if compacting.exists():
+                # Finish the interrupted compaction's records first.
+                with open(self.wal) as src, open(compacting, "a") as dst:
+                    dst.write(src.read())
+                self.wal.unlink()
+            else:
+                os.replace(self.wal, compacting)
+        data = self._load_snapshot()
+        self._replay(data, compacting)
+        self._replay(data, self.wal)
+        tmp = self.file.with_name(self.file.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.file)
+        self._drop_log(compacting)
+        self._wal_records = self._count_records()
+        self._remember(data)
 
     def load_all(self):
         return self._load()
 
+    def load_compact(self):
+        """Return the whole history as a ``CompactHistory``."""
+        return CompactHistory.from_entries(self.iter_entries())
+
     def save_habit(self, date, habit, duration, note=""):
-        data = self._load()
-        data.setdefault(date, {})[habit] = {"duration": duration, "note": note}
-        self._save(data)
+        self._write(
+            {"op": "habit", "date": date, "habit": habit,
+             "duration": duration, "note": note}
+        )
 
     def delete_habit(self, date, habit):
-        data = self._load()
-        data.get(date, {}).pop(habit, None)
-        self._save(data)
+        self._write({"op": "delete", "date": date, "habit": habit})
 
     def save_mood(self, date, score):
+        self._write({"op": "mood", "date": date, "score": score})
+
+    def import_entries(self, entries):
+        """Apply many habit/mood records with a single file rewrite."""
+        habit_rows, mood_rows = normalize_entries(entries)
         data = self._load()
-        data.setdefault(date, {})["mood"] = score
+        for date, habit, duration, note in habit_rows:
+            data.setdefault(date, {})[habit] = {"duration": duration, "note": note}
+        for date, score in mood_rows:
+            data.setdefault(date, {})["mood"] = score
+        self._indexes_for = None
         self._save(data)
+        return len(habit_rows) + len(mood_rows)
+
+    def get_streaks(self, habits, today=None):
+        """Return current/longest streak and last completed day per habit."""
+        today = to_day_number(today or datetime.date.today())
+        index = self._index("streaks", StreakIndex.from_data)
+        return {habit: index.stats(habit, today) for habit in habits}
+
+    def rebuild_streaks(self):
+        """Recompute the streak index from scratch."""
+        self._indexes.pop("streaks", None)
+        self._index("streaks", StreakIndex.from_data)
+
+    def get_completion_bits(self, habits, start_date, end_date):
+        """Return ``{habit: bitset}`` of completed days in the range.
+
+        Bit ``i`` stands for ``start_date`` plus ``i`` days; served from the
+        running ``CompletionBits`` index.
+        """
+        start, end = to_day_number(start_date), to_day_number(end_date)
+        index = self._index("completion", CompletionBits.from_data)
+        return {habit: index.window(habit, start, end) for habit in habits}
+
+    def get_mood_summary(self, today=None, verify=False):
+        """Return the 7-day, 30-day and overall mood averages.
+
+        Served from the running ``MoodIndex``. With ``verify=True`` the
+        result is cross-checked against a full recompute; on mismatch a
+        warning is logged, the index rebuilt and the recomputed values
+        returned.
+        """
+        today = today or datetime.date.today()
+        summary = self._index("moods", MoodIndex.from_data).summary(today)
+        if not verify:
+            return summary
+        expected = summarize_moods(self.iter_entries(kinds=("mood",)), today)
+        if summary != expected:
+            logging.warning("Mood aggregates drifted: %s != %s", summary, expected)
+            self._indexes.pop("moods", None)
+        return expected
 
     def get_range(self, start_date, end_date):
         all_data = self._load()
@@ -57,6 +1018,79 @@ class JSONBackend:
             cur += datetime.timedelta(days=1)
         return out
 
+    def get_last_write(self):
+        """Return ``(version, unix_time)`` of the most recent write.
+
+        The version is derived from the file stamps, so it costs a few
+        ``stat`` calls and also notices external writers.
+        """
+        stamp = self._stamp()
+        mtimes = [st[0] for st in stamp if st]
+        return (stamp, self._touches), (max(mtimes) / 1e9 if mtimes else None)
+
+    def touch(self):
+        """Record a write that changed no entries (e.g. a settings save)."""
+        self._touches += 1
+
+    def get_data_version(self, start_date, end_date):
+        """Return a number that changes whenever data in the range changes.
+
+        Writes bump the week they touch; any external change to the files
+        bumps every week.
+        """
+        index = self._index("weeks", WeekVersions.from_data)
+        return index.version(to_day_number(start_date), to_day_number(end_date))
+
+    def iter_entries(self, start=None, end=None, kinds=KINDS):
+        """Yield ``HabitEntry``/``MoodEntry`` rows in date order.
+
+        Rows are produced lazily from the cached parse rather than by
+        building another copy of the history.
+        """
+        return iter_dict_entries(self._load(), start, end, kinds)
+
+    def _search_path(self):
+        return self.file.with_name(self.file.name + ".search")
+
+    def _note_index(self, data):
+        """Load the on-disk note index if it matches ``data``, else build it."""
+        try:
+            with open(self._search_path()) as f:
+                saved = json.load(f)
+            if saved["stamp"] == json.loads(json.dumps(self._cache_stamp)):
+                return NoteIndex.load(saved["postings"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            pass
+        return NoteIndex.from_data(data)
+
+    def search_notes(self, query, limit=20):
+        """Return ``{"date", "habit", "snippet"}`` for notes matching ``query``.
+
+        Uses an inverted index kept current by writes (see ``_track``) and
+        persisted next to the data file (``<file>.search``) so a restart only
+        rebuilds it when the data changed underneath.
+        """
+        index = self._index("search", self._note_index)
+        if index.dirty:
+            tmp = self._search_path().with_name(self._search_path().name + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(
+                    {"stamp": self._cache_stamp, "postings": index.dump()},
+                    f,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp, self._search_path())
+            index.dirty = False
+        data = self._load()
+        return [
+            {
+                "date": date,
+                "habit": habit,
+                "snippet": highlight(data[date][habit].get("note", ""), query),
+            }
+            for date, habit in index.search(query)[:limit]
+        ]
+
     def get_mood_series(self):
         data = self._load()
         series = []
@@ -68,137 +1102,1035 @@ class JSONBackend:
 
 
 class SQLiteBackend:
-    def __init__(self, db_path="data/habits.db"):
+    """SQLite backend.
+
+    By default one connection is shared by every thread. With ``pooled=True``
+    each operation checks a connection out of a bounded ``ConnectionPool``
+    (at most ``maxconn``), and the database runs in WAL journal mode with the
+    tuned ``PRAGMAS``, so readers keep going while a writer commits.
+    Connections are reused across threads, so a thread-per-request server
+    does not open one per request.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-8000",
+        "PRAGMA mmap_size=67108864",
+        "PRAGMA temp_store=MEMORY",
+    )
+    pooled = False
+    PARAM = "?"
+    DAY_COLUMN = "day"
+
+    def __init__(self, db_path="data/habits.db", pooled=False, maxconn=8):
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.db_path = db_path
+        self.pooled = pooled
+        if pooled:
+            self.conn = None
+            self.pool = ConnectionPool(self._connect, minconn=1, maxconn=maxconn)
+        else:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.pool = None
         self._init_schema()
 
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path, timeout=30, check_same_thread=False
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Check a connection out for one operation (or use the shared one)."""
+        if self.pool is None:
+            yield self.conn
+            return
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        finally:
+            self.pool.putconn(conn)
+
+    def close(self):
+        """Close every connection opened by this backend."""
+        if self.conn is not None:
+            self.conn.close()
+        if self.pool is not None:
+            self.pool.closeall()
+
+    def _run(self, work):
+        """Run ``work(cursor)`` in one transaction and return its result."""
+        with self._connection() as conn:
+            with closing(conn.cursor()) as cur:
+                try:
+                    result = work(cur)
+                except Exception:
+                    conn.rollback()
+                    raise
+            conn.commit()
+        return result
+
     def _init_schema(self):
-        with closing(self.conn.cursor()) as cur:
-            cur.executescript(
-                """
-                CREATE TABLE IF NOT EXISTS habit_log (
-                  date TEXT,
-                  habit TEXT,
-                  duration INT,
-                  note TEXT,
-                  PRIMARY KEY(date, habit)
-                );
-                CREATE TABLE IF NOT EXISTS mood_log (
-                  date TEXT PRIMARY KEY,
-                  score INT
-                );
-                """
+        def work(cur):
+            # Serialize concurrent upgraders (e.g. several gunicorn workers).
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("PRAGMA user_version")
+            version = cur.fetchone()[0]
+            if version < 2:
+                self._migrate_day_numbers(cur)
+            if version < 3:
+                self._migrate_runs(cur)
+            if version < 4:
+                self._migrate_mood_totals(cur)
+            if version < 5:
+                self._migrate_week_versions(cur)
+            if version < 6:
+                self._migrate_last_write(cur)
+            if version < 7:
+                self._migrate_note_search(cur)
+            if version < SCHEMA_VERSION:
+                cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        self._run(work)
+
+    def _migrate_day_numbers(self, cur):
+        """v2: integer day numbers instead of ISO date TEXT."""
+        cur.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'table' AND name IN ('habit_log', 'mood_log')"
+        )
+        legacy = {name for (name,) in cur.fetchall()}
+        for name in legacy:
+            cur.execute(f"ALTER TABLE {name} RENAME TO {name}_v1")
+        cur.execute(
+            """
+            CREATE TABLE habit_log (
+              day INTEGER NOT NULL,
+              habit TEXT NOT NULL,
+              duration INT,
+              note TEXT,
+              PRIMARY KEY(day, habit)
+            ) WITHOUT ROWID
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE mood_log (
+              day INTEGER PRIMARY KEY,
+              score INT
+            )
+            """
+        )
+        # The primary key already orders rows by day; this one serves
+        # per-habit lookups (streaks) without touching the table.
+        cur.execute(
+            "CREATE INDEX habit_log_habit_day ON habit_log (habit, day, duration)"
+        )
+        if "habit_log" in legacy:
+            cur.execute("SELECT date, habit, duration, note FROM habit_log_v1")
+            cur.executemany(
+                "INSERT OR REPLACE INTO habit_log VALUES (?, ?, ?, ?)",
+                _upgrade_rows(cur.fetchall()),
+            )
+            cur.execute("DROP TABLE habit_log_v1")
+        if "mood_log" in legacy:
+            cur.execute("SELECT date, score FROM mood_log_v1")
+            cur.executemany(
+                "INSERT OR REPLACE INTO mood_log VALUES (?, ?)",
+                _upgrade_rows(cur.fetchall()),
+            )
+            cur.execute("DROP TABLE mood_log_v1")
+
+    def _migrate_runs(self, cur):
+        """v3: materialized runs of completed days for streaks."""
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS habit_runs (
+              habit TEXT NOT NULL,
+              start_day INTEGER NOT NULL,
+              end_day INTEGER NOT NULL,
+              length INTEGER NOT NULL,
+              PRIMARY KEY(habit, start_day)
             )
-            self.conn.commit()
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS habit_runs_longest ON habit_runs (habit, length)"
+        )
+        self._rebuild_runs(cur)
+
+    def _migrate_mood_totals(self, cur):
+        """v4: running mood total/count for O(1) overall averages."""
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mood_totals (
+              id INTEGER PRIMARY KEY CHECK (id = 1),
+              total INTEGER NOT NULL,
+              count INTEGER NOT NULL
+            )
+            """
+        )
+        self._refresh_mood_totals(cur)
+
+    def _migrate_week_versions(self, cur):
+        """v5: per-week write counters for render caches and ETags."""
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS week_versions (
+              week_start INTEGER PRIMARY KEY,
+              version INTEGER NOT NULL
+            )
+            """
+        )
+
+    def _migrate_last_write(self, cur):
+        """v6: backend-wide write counter for HTTP validators."""
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS last_write (
+              id INTEGER PRIMARY KEY CHECK (id = 1),
+              version INTEGER NOT NULL,
+              written_at DOUBLE PRECISION NOT NULL
+            )
+            """
+        )
+        cur.execute(
+            self._sql(
+                "INSERT INTO last_write (id, version, written_at) VALUES (1, 0, ?) "
+                "ON CONFLICT(id) DO NOTHING"
+            ),
+            (time.time(),),
+        )
+
+    def _record_write(self, cur, days):
+        """Bump the backend-wide version and that of every week in ``days``."""
+        cur.execute(
+            self._sql("UPDATE last_write SET version = version + 1, written_at = ?"),
+            (time.time(),),
+        )
+        cur.executemany(
+            self._sql(
+                "INSERT INTO week_versions (week_start, version) VALUES (?, 1) "
+                "ON CONFLICT(week_start) "
+                "DO UPDATE SET version = week_versions.version + 1"
+            ),
+            [(week,) for week in sorted({week_of(day) for day in days})],
+        )
+
+    def _migrate_note_search(self, cur):
+        """v7: FTS5 index over habit notes."""
+        # habit_log has no rowid, so note_ids hands out the FTS rowids.
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS note_ids (
+              id INTEGER PRIMARY KEY,
+              day INTEGER NOT NULL,
+              habit TEXT NOT NULL,
+              UNIQUE(day, habit)
+            )
+            """
+        )
+        cur.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS note_search USING fts5(note)"
+        )
+        self._rebuild_note_search(cur)
+
+    def _rebuild_note_search(self, cur):
+        cur.execute("DELETE FROM note_search")
+        cur.execute("DELETE FROM note_ids")
+        cur.execute(
+            "INSERT INTO note_ids (day, habit) "
+            "SELECT day, habit FROM habit_log WHERE note <> ''"
+        )
+        cur.execute(
+            "INSERT INTO note_search (rowid, note) "
+            "SELECT i.id, h.note FROM note_ids i "
+            "JOIN habit_log h ON h.day = i.day AND h.habit = i.habit"
+        )
+
+    def _index_note(self, cur, day, habit, note):
+        """Replace the search entry for one ``(day, habit)`` note."""
+        cur.execute(
+            "SELECT id FROM note_ids WHERE day = ? AND habit = ?", (day, habit)
+        )
+        row = cur.fetchone()
+        if row:
+            cur.execute("DELETE FROM note_search WHERE rowid = ?", row)
+            if not note:
+                cur.execute("DELETE FROM note_ids WHERE id = ?", row)
+                return
+            doc = row[0]
+        elif not note:
+            return
+        else:
+            cur.execute(
+                "INSERT INTO note_ids (day, habit) VALUES (?, ?)", (day, habit)
+            )
+            doc = cur.lastrowid
+        cur.execute("INSERT INTO note_search (rowid, note) VALUES (?, ?)", (doc, note))
+
+    def _refresh_mood_totals(self, cur):
+        cur.execute("DELETE FROM mood_totals")
+        cur.execute(
+            "INSERT INTO mood_totals (id, total, count) "
+            "SELECT 1, COALESCE(SUM(score), 0), COUNT(score) FROM mood_log"
+        )
+
+    def _adjust_mood_totals(self, cur, old, new):
+        """Account for one day's mood changing from ``old`` to ``new``."""
+        total = (new or 0) - (old or 0)
+        count = (new is not None) - (old is not None)
+        cur.execute(
+            self._sql("UPDATE mood_totals SET total = total + ?, count = count + ?"),
+            (total, count),
+        )
+
+    def _sql(self, query):
+        """Adapt a query written with ``?`` placeholders to this driver."""
+        return query if self.PARAM == "?" else query.replace("?", self.PARAM)
+
+    def _completed_days(self, cur, habits=None):
+        """Return ``(habit, day_number)`` of completed days by habit, day."""
+        sql = "SELECT habit, day FROM habit_log WHERE duration <> 0"
+        params = []
+        if habits is not None:
+            sql += f" AND habit IN ({', '.join('?' * len(habits))})"
+            params = list(habits)
+        cur.execute(sql + " ORDER BY habit, day", params)
+        return cur.fetchall()
+
+    def _rebuild_runs(self, cur, habits=None):
+        """Recompute ``habit_runs`` for ``habits`` (all when ``None``)."""
+        if habits is None:
+            cur.execute("DELETE FROM habit_runs")
+        else:
+            habits = sorted(habits)
+            if not habits:
+                return
+            cur.execute(
+                self._sql(
+                    f"DELETE FROM habit_runs WHERE habit IN ({', '.join('?' * len(habits))})"
+                ),
+                habits,
+            )
+        rows = []
+        for habit, group in itertools.groupby(
+            self._completed_days(cur, habits), key=lambda row: row[0]
+        ):
+            for start, end in runs_from_days(day for _, day in group):
+                rows.append((habit, start, end, end - start + 1))
+        cur.executemany(
+            self._sql(
+                "INSERT INTO habit_runs (habit, start_day, end_day, length) "
+                "VALUES (?, ?, ?, ?)"
+            ),
+            rows,
+        )
+
+    def _mark_run(self, cur, habit, day, done):
+        """Apply one completed/cleared day to ``habit_runs``."""
+        cur.execute(
+            self._sql(
+                "SELECT start_day, end_day FROM habit_runs "
+                "WHERE habit = ? AND start_day <= ? ORDER BY start_day DESC LIMIT 2"
+            ),
+            (habit, day + 1),
+        )
+        touching = [(s, e) for s, e in cur.fetchall() if e >= day - 1]
+        drop, add = plan_run_update(touching, day, done)
+        for start, _ in drop:
+            cur.execute(
+                self._sql("DELETE FROM habit_runs WHERE habit = ? AND start_day = ?"),
+                (habit, start),
+            )
+        for start, end in add:
+            cur.execute(
+                self._sql(
+                    "INSERT INTO habit_runs (habit, start_day, end_day, length) "
+                    "VALUES (?, ?, ?, ?)"
+                ),
+                (habit, start, end, end - start + 1),
+            )
+
+    def get_streaks(self, habits, today=None):
+        """Return current/longest streak and last completed day per habit.
+
+        Each value is an indexed lookup on ``habit_runs``, so the cost does
+        not grow with streak length.
+        """
+        today = to_day_number(today or datetime.date.today())
+
+        def work(cur):
+            out = {}
+            for habit in habits:
+                cur.execute(
+                    self._sql(
+                        "SELECT start_day, end_day FROM habit_runs "
+                        "WHERE habit = ? AND start_day <= ? "
+                        "ORDER BY start_day DESC LIMIT 1"
+                    ),
+                    (habit, today),
+                )
+                row = cur.fetchone()
+                current = today - row[0] + 1 if row and row[1] >= today else 0
+                cur.execute(
+                    self._sql("SELECT MAX(length) FROM habit_runs WHERE habit = ?"),
+                    (habit,),
+                )
+                longest = cur.fetchone()[0] or 0
+                cur.execute(
+                    self._sql(
+                        "SELECT end_day FROM habit_runs WHERE habit = ? "
+                        "ORDER BY start_day DESC LIMIT 1"
+                    ),
+                    (habit,),
+                )
+                row = cur.fetchone()
+                out[habit] = streak_summary(current, longest, row[0] if row else None)
+            return out
+
+        return self._run(work)
+
+    def get_completion_bits(self, habits, start_date, end_date):
+        """Return ``{habit: bitset}`` of completed days in the range.
+
+        Bit ``i`` stands for ``start_date`` plus ``i`` days. The bitsets are
+        assembled from the ``habit_runs`` overlapping the range, so the cost
+        is one indexed query and a shift per run.
+        """
+        start, end = to_day_number(start_date), to_day_number(end_date)
+        habits = list(habits)
+        if not habits:
+            return {}
+
+        def work(cur):
+            cur.execute(
+                self._sql(
+                    "SELECT habit, start_day, end_day FROM habit_runs "
+                    f"WHERE habit IN ({', '.join('?' * len(habits))}) "
+                    "AND start_day <= ? AND end_day >= ?"
+                ),
+                [*habits, end, start],
+            )
+            runs = {}
+            for habit, first, last in cur.fetchall():
+                runs.setdefault(habit, []).append((first, last))
+            return {
+                habit: bits_from_runs(runs.get(habit, []), start, end)
+                for habit in habits
+            }
+
+        return self._run(work)
+
+    def rebuild_streaks(self):
+        """Recompute ``habit_runs`` from ``habit_log``."""
+        self._run(self._rebuild_runs)
+
+    def _day_param(self, day):
+        """Bind value for a day number in ``DAY_COLUMN`` comparisons."""
+        return day if self.DAY_COLUMN == "day" else from_day_number(day)
+
+    def get_mood_summary(self, today=None, verify=False):
+        """Return the 7-day, 30-day and overall mood averages.
+
+        The overall average comes from ``mood_totals`` and the windows are
+        short primary-key range scans. With ``verify=True`` the result is
+        cross-checked against a full recompute; on mismatch a warning is
+        logged, ``mood_totals`` refreshed and the recomputed values returned.
+        """
+        today = today or datetime.date.today()
+        week_start, month_start = mood_windows(to_day_number(today))
+        window = (
+            f"SELECT {{}}(score) FROM mood_log WHERE {self.DAY_COLUMN} >= ?"
+        )
+
+        def work(cur):
+            cur.execute(
+                self._sql(
+                    "SELECT (SELECT total FROM mood_totals), "
+                    "(SELECT count FROM mood_totals), "
+                    f"({window.format('SUM')}), ({window.format('COUNT')}), "
+                    f"({window.format('SUM')}), ({window.format('COUNT')})"
+                ),
+                [self._day_param(d) for d in (week_start, week_start, month_start, month_start)],
+            )
+            return cur.fetchone()
+
+        total, count, week_sum, week_count, month_sum, month_count = self._run(work)
+        summary = {
+            "weekly_avg": _average(week_sum or 0, week_count),
+            "30d_avg": _average(month_sum or 0, month_count),
+            "overall_avg": _average(total or 0, count or 0),
+        }
+        if not verify:
+            return summary
+        expected = summarize_moods(self.iter_entries(kinds=("mood",)), today)
+        if summary != expected:
+            logging.warning("Mood aggregates drifted: %s != %s", summary, expected)
+            self._run(self._refresh_mood_totals)
+        return expected
 
     def load_all(self):
-        data = {}
-        with closing(self.conn.cursor()) as cur:
-            cur.execute("SELECT date, habit, duration, note FROM habit_log")
+        def work(cur):
+            data = {}
+            cur.execute("SELECT day, habit, duration, note FROM habit_log")
             for d, h, dur, note in cur.fetchall():
-                data.setdefault(d, {})[h] = {"duration": dur, "note": note}
-            cur.execute("SELECT date, score FROM mood_log")
+                data.setdefault(from_day_number(d), {})[h] = {
+                    "duration": dur,
+                    "note": note,
+                }
+            cur.execute("SELECT day, score FROM mood_log")
             for d, s in cur.fetchall():
-                data.setdefault(d, {})["mood"] = s
-        return data
+                data.setdefault(from_day_number(d), {})["mood"] = s
+            return data
+
+        return self._run(work)
+
+    def load_compact(self):
+        """Return the whole history as a ``CompactHistory``.
+
+        Only day, habit and duration are read up front; each note is queried
+        when a template or caller first reads it.
+        """
+        col = self.DAY_COLUMN
+
+        def day_number(day):
+            return day if isinstance(day, int) else to_day_number(day)
+
+        def work(cur):
+            history = CompactHistory(self._load_note)
+            cur.execute(f"SELECT {col}, habit, duration FROM habit_log ORDER BY 1, 2")
+            for day, habit, duration in cur:
+                history.add_habit(day_number(day), habit, duration)
+            cur.execute(f"SELECT {col}, score FROM mood_log ORDER BY 1")
+            for day, score in cur:
+                history.add_mood(day_number(day), score)
+            return history
+
+        return self._run(work)
+
+    def _load_note(self, day, habit):
+        def work(cur):
+            cur.execute(
+                self._sql(
+                    f"SELECT note FROM habit_log WHERE {self.DAY_COLUMN} = ? "
+                    "AND habit = ?"
+                ),
+                (self._day_param(day), habit),
+            )
+            row = cur.fetchone()
+            return (row[0] or "") if row else ""
+
+        return self._run(work)
 
     def save_habit(self, date, habit, duration, note=""):
-        with closing(self.conn.cursor()) as cur:
+        def work(cur):
             cur.execute(
                 """
-                INSERT INTO habit_log (date, habit, duration, note)
+                INSERT INTO habit_log (day, habit, duration, note)
                 VALUES (?, ?, ?, ?)
-                ON CONFLICT(date, habit)
+                ON CONFLICT(day, habit)
                 DO UPDATE SET duration=excluded.duration, note=excluded.note
                 """,
-                (date, habit, duration, note),
+                (to_day_number(date), habit, duration, note),
             )
-            self.conn.commit()
+            self._mark_run(cur, habit, to_day_number(date), bool(duration))
+            self._index_note(cur, to_day_number(date), habit, note)
+            self._record_write(cur, [to_day_number(date)])
+
+        self._run(work)
 
     def delete_habit(self, date, habit):
-        with closing(self.conn.cursor()) as cur:
+        def work(cur):
             cur.execute(
-                "DELETE FROM habit_log WHERE date = ? AND habit = ?",
-                (date, habit),
+                "DELETE FROM habit_log WHERE day = ? AND habit = ?",
+                (to_day_number(date), habit),
             )
-            self.conn.commit()
+            self._mark_run(cur, habit, to_day_number(date), False)
+            self._index_note(cur, to_day_number(date), habit, None)
+            self._record_write(cur, [to_day_number(date)])
+
+        self._run(work)
 
     def save_mood(self, date, score):
-        with closing(self.conn.cursor()) as cur:
+        def work(cur):
+            cur.execute(
+                "SELECT score FROM mood_log WHERE day = ?", (to_day_number(date),)
+            )
+            row = cur.fetchone()
+            self._adjust_mood_totals(cur, row[0] if row else None, score)
             cur.execute(
                 """
-                INSERT INTO mood_log (date, score)
+                INSERT INTO mood_log (day, score)
                 VALUES (?, ?)
-                ON CONFLICT(date) DO UPDATE SET score=excluded.score
+                ON CONFLICT(day) DO UPDATE SET score=excluded.score
                 """,
-                (date, score),
+                (to_day_number(date), score),
+            )
+            self._record_write(cur, [to_day_number(date)])
+
+        self._run(work)
+
+    def import_entries(self, entries):
+        """Upsert many habit/mood records in one transaction."""
+        habit_rows, mood_rows = normalize_entries(entries)
+
+        def work(cur):
+            cur.executemany(
+                """
+                INSERT INTO habit_log (day, habit, duration, note)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(day, habit)
+                DO UPDATE SET duration=excluded.duration, note=excluded.note
+                """,
+                ((to_day_number(d), h, dur, n) for d, h, dur, n in habit_rows),
+            )
+            cur.executemany(
+                """
+                INSERT INTO mood_log (day, score)
+                VALUES (?, ?)
+                ON CONFLICT(day) DO UPDATE SET score=excluded.score
+                """,
+                ((to_day_number(d), score) for d, score in mood_rows),
+            )
+            self._rebuild_runs(cur, {habit for _, habit, _, _ in habit_rows})
+            if habit_rows:
+                self._rebuild_note_search(cur)
+            if mood_rows:
+                self._refresh_mood_totals(cur)
+            self._record_write(
+                cur,
+                [to_day_number(row[0]) for row in itertools.chain(habit_rows, mood_rows)],
             )
-            self.conn.commit()
+
+        self._run(work)
+        return len(habit_rows) + len(mood_rows)
 
     def get_range(self, start_date, end_date):
-        data = {}
-        with closing(self.conn.cursor()) as cur:
+        first = to_day_number(start_date)
+        last = to_day_number(end_date)
+
+        def work(cur):
+            data = {}
             cur.execute(
-                "SELECT date, habit, duration, note FROM habit_log WHERE date BETWEEN ? AND ?",
-                (start_date, end_date),
+                "SELECT day, habit, duration, note FROM habit_log WHERE day BETWEEN ? AND ?",
+                (first, last),
             )
             for d, h, dur, note in cur.fetchall():
-                data.setdefault(d, {})[h] = {"duration": dur, "note": note}
+                data.setdefault(from_day_number(d), {})[h] = {
+                    "duration": dur,
+                    "note": note,
+                }
             cur.execute(
-                "SELECT date, score FROM mood_log WHERE date BETWEEN ? AND ?",
-                (start_date, end_date),
+                "SELECT day, score FROM mood_log WHERE day BETWEEN ? AND ?",
+                (first, last),
             )
             for d, s in cur.fetchall():
-                data.setdefault(d, {})["mood"] = s
+                data.setdefault(from_day_number(d), {})["mood"] = s
+            return data
+
+        data = self._run(work)
         # ensure keys for each date in range
-        start = datetime.date.fromisoformat(start_date)
-        end = datetime.date.fromisoformat(end_date)
-        cur_date = start
-        while cur_date <= end:
-            data.setdefault(str(cur_date), {})
-            cur_date += datetime.timedelta(days=1)
+        for day in range(first, last + 1):
+            data.setdefault(from_day_number(day), {})
         return data
 
+    def get_last_write(self):
+        """Return ``(version, unix_time)`` of the most recent write."""
+
+        def work(cur):
+            cur.execute("SELECT version, written_at FROM last_write")
+            row = cur.fetchone()
+            return tuple(row) if row else (0, None)
+
+        return self._run(work)
+
+    def touch(self):
+        """Record a write that changed no entries (e.g. a settings save)."""
+
+        def work(cur):
+            self._record_write(cur, [])
+
+        self._run(work)
+
+    def get_data_version(self, start_date, end_date):
+        """Return a number that changes whenever data in the range changes."""
+        first = to_day_number(start_date)
+        last = to_day_number(end_date)
+
+        def work(cur):
+            cur.execute(
+                self._sql(
+                    "SELECT COALESCE(SUM(version), 0) FROM week_versions "
+                    "WHERE week_start BETWEEN ? AND ?"
+                ),
+                (week_of(first), last),
+            )
+            return cur.fetchone()[0]
+
+        return self._run(work)
+
+    @staticmethod
+    def _entries_query(start, end, kinds, param, date_col):
+        """Build the date-ordered UNION behind ``iter_entries``."""
+        where = []
+        bounds = []
+        if start:
+            where.append(f"{date_col} >= {param}")
+            bounds.append(start)
+        if end:
+            where.append(f"{date_col} <= {param}")
+            bounds.append(end)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        parts = []
+        params = []
+        if "habit" in kinds:
+            parts.append(
+                f"SELECT {date_col}, 0, habit, duration, note FROM habit_log{clause}"
+            )
+            params += bounds
+        if "mood" in kinds:
+            parts.append(
+                f"SELECT {date_col}, 1, NULL, score, NULL FROM mood_log{clause}"
+            )
+            params += bounds
+        return " UNION ALL ".join(parts) + " ORDER BY 1, 2, 3", params
+
+    @staticmethod
+    def _entry(date, kind, habit, value, note):
+        if kind == 0:
+            return HabitEntry(date, habit, value, note)
+        return MoodEntry(date, value)
+
+    def iter_entries(self, start=None, end=None, kinds=KINDS):
+        """Yield ``HabitEntry``/``MoodEntry`` rows in date order.
+
+        Rows are streamed from the cursor instead of being fetched at once.
+        """
+        if not kinds:
+            return
+        sql, params = self._entries_query(
+            start and to_day_number(start),
+            end and to_day_number(end),
+            kinds,
+            "?",
+            "day",
+        )
+        with self._connection() as conn, closing(conn.cursor()) as cur:
+            cur.execute(sql, params)
+            for day, kind, habit, value, note in cur:
+                yield self._entry(from_day_number(day), kind, habit, value, note)
+
+    def search_notes(self, query, limit=20):
+        """Return ``{"date", "habit", "snippet"}`` for notes matching ``query``.
+
+        Every term must match (as a prefix); results are ranked by FTS5's
+        bm25.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+
+        def work(cur):
+            cur.execute(
+                """
+                SELECT i.day, i.habit,
+                       snippet(note_search, 0, '[', ']', '…', 12)
+                FROM note_search JOIN note_ids i ON i.id = note_search.rowid
+                WHERE note_search MATCH ?
+                ORDER BY rank LIMIT ?
+                """,
+                (match, limit),
+            )
+            return [
+                {"date": from_day_number(day), "habit": habit, "snippet": snippet}
+                for day, habit, snippet in cur.fetchall()
+            ]
+
+        return self._run(work)
+
     def get_mood_series(self):
-        with closing(self.conn.cursor()) as cur:
-            cur.execute("SELECT date, score FROM mood_log ORDER BY date")
-            return [{"date": d, "score": s} for d, s in cur.fetchall()]
+        def work(cur):
+            cur.execute("SELECT day, score FROM mood_log ORDER BY day")
+            return [
+                {"date": from_day_number(d), "score": s} for d, s in cur.fetchall()
+            ]
+
+        return self._run(work)
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections.
+
+    Connections are checked out per operation and returned afterwards. Up to
+    ``maxconn`` are opened on demand and ``minconn`` are kept warm. On
+    checkout a closed connection is replaced, and one that sat idle for more
+    than ``ping_after`` seconds is probed with ``SELECT 1`` first.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=30.0, ping_after=30.0):
+        if minconn > maxconn:
+            raise ValueError("minconn must not exceed maxconn")
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = []  # (connection, returned_at), most recent last
+        self._size = 0
+        self._cond = threading.Condition()
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    @property
+    def size(self):
+        """Number of open connections, idle or checked out."""
+        return self._size
+
+    def _healthy(self, conn, idle_since):
+        if getattr(conn, "closed", False):
+            return False
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        try:
+            with closing(conn.cursor()) as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            conn.rollback()
+        except Exception:
+            return False
+        return True
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    conn = None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise RuntimeError("connection pool exhausted")
+        if conn is not None and self._healthy(conn, idle_since):
+            return conn
+        if conn is not None:
+            self._close(conn)
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, broken=False):
+        """Return ``conn`` to the pool, or drop it if ``broken``."""
+        with self._cond:
+            if broken or getattr(conn, "closed", False):
+                self._size -= 1
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def closeall(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._size -= len(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
 
 
 class PostgresBackend(SQLiteBackend):
-    def __init__(self, url):
-        import psycopg2
+    """Postgres backend using a pool of connections.
+
+    Each operation checks a connection out of a ``ConnectionPool``. If the
+    driver reports a dropped connection the operation is retried once on a
+    fresh connection, so a restarted server does not leave a dead backend in
+    the ``get_backend`` cache. ``driver`` is any DB-API module exposing
+    ``connect``, ``OperationalError`` and ``InterfaceError`` (``psycopg2`` by
+    default).
+    """
+
+    PARAM = "%s"
+    DAY_COLUMN = "date"
 
-        self.conn = psycopg2.connect(url)
+    def __init__(self, url, minconn=1, maxconn=10, driver=None):
+        if driver is None:
+            import psycopg2 as driver
+
+        self.url = url
+        self._disconnects = (driver.OperationalError, driver.InterfaceError)
+        self.pool = ConnectionPool(lambda: driver.connect(url), minconn, maxconn)
         self._init_schema()
 
+    def _run(self, work):
+        for attempt in range(2):
+            conn = self.pool.getconn()
+            try:
+                with closing(conn.cursor()) as cur:
+                    result = work(cur)
+                conn.commit()
+            except self._disconnects:
+                self.pool.putconn(conn, broken=True)
+                if attempt:
+                    raise
+                logging.warning("Postgres connection lost; reconnecting")
+                continue
+            except Exception:
+                conn.rollback()
+                self.pool.putconn(conn)
+                raise
+            self.pool.putconn(conn)
+            return result
+
+    def close(self):
+        self.pool.closeall()
+
     def _init_schema(self):
-        with self.conn.cursor() as cur:
+        def work(cur):
+            cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+            # Serialize concurrent upgraders (e.g. several gunicorn workers).
+            cur.execute("LOCK TABLE schema_version IN EXCLUSIVE MODE")
+            cur.execute("SELECT MAX(version) FROM schema_version")
+            row = cur.fetchone()
+            version = row[0] if row and row[0] is not None else 0
+            if version >= SCHEMA_VERSION:
+                return
+            if version < 2:
+                self._migrate_day_numbers(cur)
+            if version < 3:
+                self._migrate_runs(cur)
+            if version < 4:
+                self._migrate_mood_totals(cur)
+            if version < 5:
+                self._migrate_week_versions(cur)
+            if version < 6:
+                self._migrate_last_write(cur)
+            if version < 7:
+                self._migrate_note_search(cur)
+            cur.execute("DELETE FROM schema_version")
             cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS habit_log (
-                  date TEXT,
-                  habit TEXT,
-                  duration INT,
-                  note TEXT,
-                  PRIMARY KEY(date, habit)
-                );
-                """
+                "INSERT INTO schema_version (version) VALUES (%s)", (SCHEMA_VERSION,)
             )
+
+        self._run(work)
+
+    def _migrate_day_numbers(self, cur):
+        """v2: native DATE columns instead of ISO date TEXT."""
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS habit_log (
+              date DATE,
+              habit TEXT,
+              duration INT,
+              note TEXT,
+              PRIMARY KEY(date, habit)
+            );
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mood_log (
+              date DATE PRIMARY KEY,
+              score INT
+            );
+            """
+        )
+        # Tables created before schema version 2 stored ISO dates as TEXT.
+        cur.execute("ALTER TABLE habit_log ALTER COLUMN date TYPE DATE USING date::date")
+        cur.execute("ALTER TABLE mood_log ALTER COLUMN date TYPE DATE USING date::date")
+        # The primary key serves day ranges; this one per-habit lookups.
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS habit_log_habit_date
+            ON habit_log (habit, date) INCLUDE (duration)
+            """
+        )
+
+    def _completed_days(self, cur, habits=None):
+        sql = "SELECT habit, date FROM habit_log WHERE duration <> 0"
+        params = []
+        if habits is not None:
+            sql += " AND habit = ANY(%s)"
+            params = [list(habits)]
+        cur.execute(sql + " ORDER BY habit, date", params)
+        return [(habit, date.toordinal()) for habit, date in cur.fetchall()]
+
+    def _migrate_note_search(self, cur):
+        """v7: GIN index over the notes' tsvector (maintained by Postgres)."""
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS habit_log_note_search
+            ON habit_log USING GIN (to_tsvector('simple', coalesce(note, '')))
+            """
+        )
+
+    def _rebuild_note_search(self, cur):
+        pass
+
+    def search_notes(self, query, limit=20):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # Prefix match on every term, like the FTS5 query.
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+
+        def work(cur):
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS mood_log (
-                  date TEXT PRIMARY KEY,
-                  score INT
-                );
-                """
+                SELECT date, habit,
+                       ts_headline('simple', note, q,
+                                   'StartSel=[, StopSel=], MaxFragments=1')
+                FROM habit_log, to_tsquery('simple', %s) q
+                WHERE to_tsvector('simple', coalesce(note, '')) @@ q
+                ORDER BY ts_rank(to_tsvector('simple', coalesce(note, '')), q) DESC,
+                         date DESC
+                LIMIT %s
+                """,
+                (tsquery, limit),
             )
-            self.conn.commit()
+            return [
+                {"date": str(date), "habit": habit, "snippet": snippet}
+                for date, habit, snippet in cur.fetchall()
+            ]
+
+        return self._run(work)
+
+    def load_all(self):
+        def work(cur):
+            data = {}
+            cur.execute("SELECT date, habit, duration, note FROM habit_log")
+            for d, h, dur, note in cur.fetchall():
+                data.setdefault(str(d), {})[h] = {"duration": dur, "note": note}
+            cur.execute("SELECT date, score FROM mood_log")
+            for d, s in cur.fetchall():
+                data.setdefault(str(d), {})["mood"] = s
+            return data
+
+        return self._run(work)
 
     # Psycopg2 uses %s placeholders
     def save_habit(self, date, habit, duration, note=""):
-        with self.conn.cursor() as cur:
+        def work(cur):
             cur.execute(
                 """
                 INSERT INTO habit_log (date, habit, duration, note)
@@ -208,18 +2140,27 @@ class PostgresBackend(SQLiteBackend):
                 """,
                 (date, habit, duration, note),
             )
-            self.conn.commit()
+            self._mark_run(cur, habit, to_day_number(date), bool(duration))
+            self._record_write(cur, [to_day_number(date)])
+
+        self._run(work)
 
     def delete_habit(self, date, habit):
-        with self.conn.cursor() as cur:
+        def work(cur):
             cur.execute(
                 "DELETE FROM habit_log WHERE date = %s AND habit = %s",
                 (date, habit),
             )
-            self.conn.commit()
+            self._mark_run(cur, habit, to_day_number(date), False)
+            self._record_write(cur, [to_day_number(date)])
+
+        self._run(work)
 
     def save_mood(self, date, score):
-        with self.conn.cursor() as cur:
+        def work(cur):
+            cur.execute("SELECT score FROM mood_log WHERE date = %s", (date,))
+            row = cur.fetchone()
+            self._adjust_mood_totals(cur, row[0] if row else None, score)
             cur.execute(
                 """
                 INSERT INTO mood_log (date, score)
@@ -228,23 +2169,71 @@ class PostgresBackend(SQLiteBackend):
                 """,
                 (date, score),
             )
-            self.conn.commit()
+            self._record_write(cur, [to_day_number(date)])
+
+        self._run(work)
+
+    def import_entries(self, entries):
+        """Upsert many habit/mood records in one transaction."""
+        from psycopg2.extras import execute_values
+
+        habit_rows, mood_rows = normalize_entries(entries)
+
+        def work(cur):
+            if habit_rows:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO habit_log (date, habit, duration, note)
+                    VALUES %s
+                    ON CONFLICT(date, habit)
+                    DO UPDATE SET duration=EXCLUDED.duration, note=EXCLUDED.note
+                    """,
+                    habit_rows,
+                    page_size=1000,
+                )
+            if mood_rows:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO mood_log (date, score)
+                    VALUES %s
+                    ON CONFLICT(date) DO UPDATE SET score=EXCLUDED.score
+                    """,
+                    mood_rows,
+                    page_size=1000,
+                )
+            self._rebuild_runs(cur, {habit for _, habit, _, _ in habit_rows})
+            if habit_rows:
+                self._rebuild_note_search(cur)
+            if mood_rows:
+                self._refresh_mood_totals(cur)
+            self._record_write(
+                cur,
+                [to_day_number(row[0]) for row in itertools.chain(habit_rows, mood_rows)],
+            )
+
+        self._run(work)
+        return len(habit_rows) + len(mood_rows)
 
     def get_range(self, start_date, end_date):
-        data = {}
-        with self.conn.cursor() as cur:
+        def work(cur):
+            data = {}
             cur.execute(
                 "SELECT date, habit, duration, note FROM habit_log WHERE date BETWEEN %s AND %s",
                 (start_date, end_date),
             )
             for d, h, dur, note in cur.fetchall():
-                data.setdefault(d, {})[h] = {"duration": dur, "note": note}
+                data.setdefault(str(d), {})[h] = {"duration": dur, "note": note}
             cur.execute(
                 "SELECT date, score FROM mood_log WHERE date BETWEEN %s AND %s",
                 (start_date, end_date),
             )
             for d, s in cur.fetchall():
-                data.setdefault(d, {})["mood"] = s
+                data.setdefault(str(d), {})["mood"] = s
+            return data
+
+        data = self._run(work)
         start = datetime.date.fromisoformat(start_date)
         end = datetime.date.fromisoformat(end_date)
         cur_date = start
@@ -253,14 +2242,296 @@ class PostgresBackend(SQLiteBackend):
             cur_date += datetime.timedelta(days=1)
         return data
 
+    def iter_entries(self, start=None, end=None, kinds=KINDS):
+        """Yield ``HabitEntry``/``MoodEntry`` rows in date order.
+
+        Uses a named (server-side) cursor so rows arrive in batches of
+        ``itersize`` rather than all at once.
+        """
+        if not kinds:
+            return
+        sql, params = self._entries_query(start, end, kinds, "%s", "date")
+        conn = self.pool.getconn()
+        try:
+            with closing(conn.cursor(name="iter_entries")) as cur:
+                cur.itersize = 2000
+                cur.execute(sql, params)
+                for date, kind, habit, value, note in cur:
+                    yield self._entry(str(date), kind, habit, value, note)
+            conn.rollback()
+        except self._disconnects:
+            self.pool.putconn(conn, broken=True)
+            raise
+        except BaseException:
+            conn.rollback()
+            self.pool.putconn(conn)
+            raise
+        self.pool.putconn(conn)
+
     def get_mood_series(self):
-        with self.conn.cursor() as cur:
+        def work(cur):
             cur.execute("SELECT date, score FROM mood_log ORDER BY date")
-            return [{"date": d, "score": s} for d, s in cur.fetchall()]
+            return [{"date": str(d), "score": s} for d, s in cur.fetchall()]
+
+        return self._run(work)
+
+
+class JournalStore:
+    """``journal.md`` (``## <date>`` sections) with a sidecar index.
+
+    ``<file>.idx`` records ``[date, offset, length]`` per entry, an inverted
+    index (token -> entry numbers) for ``search`` and the journal's size and
+    mtime when it was indexed. Reads seek straight to the requested entries.
+    When the journal has grown and the last indexed header is still in place
+    (appends, possibly by another process) only the tail from that entry is
+    rescanned; any other change triggers a full rebuild, so hand-edited files
+    keep working.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self._entries = []
+        self._postings = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _close_entry(self, end, lines):
+        """Finish the last entry: set its length and index its words."""
+        if not self._entries:
+            return
+        number = len(self._entries) - 1
+        self._entries[-1][2] = end - self._entries[-1][1]
+        text = b"".join(lines).decode("utf-8", "replace")
+        for term in set(search_terms(text)):
+            self._postings.setdefault(term, []).append(number)
+
+    def _scan(self, start):
+        """Index the journal from byte ``start`` onwards."""
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            offset = start
+            lines = []
+            for line in f:
+                if line.startswith(b"## "):
+                    self._close_entry(offset, lines)
+                    date = line.decode("utf-8", "replace").replace("##", "").strip()
+                    self._entries.append([date, offset, 0])
+                    lines = []
+                elif self._entries:
+                    lines.append(line)
+                offset += len(line)
+        self._close_entry(offset, lines)
+
+    def _header_at(self, entry):
+        """Whether ``entry``'s header is still where the index says."""
+        date, offset, _ = entry
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            line = f.readline().decode("utf-8", "replace")
+        return line.startswith("## ") and line.replace("##", "").strip() == date
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                saved = json.load(f)
+            self._entries, self._postings = saved["entries"], saved["postings"]
+            self._stamp = tuple(saved["stamp"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            self._entries, self._postings, self._stamp = [], {}, None
+
+    def _drop_last_entry(self):
+        number = len(self._entries) - 1
+        for term, numbers in list(self._postings.items()):
+            if numbers[-1] == number:
+                numbers.pop()
+                if not numbers:
+                    del self._postings[term]
+        return self._entries.pop()
+
+    def _sync(self):
+        """Bring the in-memory and sidecar index up to date with the file."""
+        st = JSONBackend._stat(self.path)
+        stamp = st[:2] if st else None
+        if stamp == self._stamp:
+            return
+        if stamp is None:
+            self._entries, self._postings, self._stamp = [], {}, None
+            return
+        if self._stamp is None:
+            self._load_index()
+            if self._stamp == stamp:
+                return
+        indexed = self._stamp[1] if self._stamp else 0
+        if self._entries and stamp[1] >= indexed and self._header_at(self._entries[-1]):
+            # Appended to: the last entry may have been extended, so start there.
+            self._scan(self._drop_last_entry()[1])
+        else:
+            self._entries, self._postings = [], {}
+            self._scan(0)
+        self._stamp = stamp
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {"stamp": stamp, "entries": self._entries, "postings": self._postings},
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp, self.index_path)
+
+    def _read(self, picked):
+        out = []
+        with open(self.path, "rb") as f:
+            for date, start, length in picked:
+                f.seek(start)
+                raw = f.read(length).decode("utf-8", "replace")
+                _, _, text = raw.replace("\r\n", "\n").partition("\n")
+                out.append({"date": date, "text": text})
+        return out
+
+    def count(self):
+        with self._lock:
+            self._sync()
+            return len(self._entries)
+
+    def entries(self, offset=0, limit=None):
+        """Return ``{"date", "text"}`` dicts, newest first, for one page."""
+        with self._lock:
+            self._sync()
+            newest = self._entries[::-1]
+            page = newest[offset:None if limit is None else offset + limit]
+        return self._read(page)
+
+    def search(self, query, limit=20):
+        """Return ``{"date", "snippet"}`` for entries matching every term.
+
+        Terms match as prefixes; newest entries come first.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            self._sync()
+            found = None
+            for term in terms:
+                numbers = set()
+                for token, postings in self._postings.items():
+                    if token.startswith(term):
+                        numbers.update(postings)
+                found = numbers if found is None else found & numbers
+                if not found:
+                    return []
+            picked = [self._entries[n] for n in sorted(found, reverse=True)[:limit]]
+        return [
+            {"date": entry["date"], "snippet": highlight(entry["text"].strip(), query)}
+            for entry in self._read(picked)
+        ]
+
+    def append(self, date, text):
+        """Add an entry for ``date`` and index it."""
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(f"\n## {date}\n{text.strip()}\n")
+            self._sync()
+
+
+class PromptCache:
+    """Disk-backed, content-addressed cache of AI-enriched prompts.
+
+    Entries live in one JSON file, expire ``ttl`` seconds after they were
+    stored and are evicted oldest-first beyond ``maxsize``. Lookups are served
+    from memory; the file is re-read only when another process (e.g. a second
+    gunicorn worker) has rewritten it. ``hits``/``misses``/``expired`` count
+    lookups.
+    """
+
+    def __init__(self, path, ttl=86400, maxsize=256):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        """Return the cache key for ``parts`` (e.g. model, system, prompt)."""
+        raw = json.dumps(parts, separators=(",", ":")).encode()
+        return hashlib.sha256(raw).hexdigest()
+
+    def _sync(self):
+        stamp = JSONBackend._stat(self.path)
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def get(self, key):
+        """Return the cached value for ``key`` or ``None``."""
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["at"] > self.ttl:
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["value"]
+
+    def put(self, key, value):
+        with self._lock:
+            self._sync()
+            now = time.time()
+            entries = {
+                k: e for k, e in self._entries.items() if now - e["at"] <= self.ttl
+            }
+            entries[key] = {"value": value, "at": now}
+            if len(entries) > self.maxsize:
+                newest = sorted(entries.items(), key=lambda item: item[1]["at"])
+                entries = dict(newest[-self.maxsize:])
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+            self._entries = entries
+            self._stamp = JSONBackend._stat(self.path)
+
+    def clear(self):
+        with self._lock:
+            JSONBackend._drop_log(self.path)
+            self._entries = {}
+            self._stamp = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "size": len(self._entries),
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
 
 
 def get_backend(json_path=None):
-    key = (os.getenv("DATABASE_URL"), os.getenv("APP_MODE"), json_path)
+    key = (
+        os.getenv("DATABASE_URL"),
+        os.getenv("APP_MODE"),
+        os.getenv("HABIT_JSON_JOURNAL"),
+        os.getenv("SQLITE_POOL"),
+        os.getenv("SQLITE_POOL_MAX"),
+        json_path,
+    )
     if not hasattr(get_backend, "_cache"):
         get_backend._cache = {}
     if key in get_backend._cache:
@@ -268,14 +2539,24 @@ def get_backend(json_path=None):
 
     if os.getenv("DATABASE_URL"):
         try:
-            backend = PostgresBackend(os.getenv("DATABASE_URL"))
+            backend = PostgresBackend(
+                os.getenv("DATABASE_URL"),
+                minconn=int(os.getenv("PG_POOL_MIN", "1")),
+                maxconn=int(os.getenv("PG_POOL_MAX", "10")),
+            )
         except Exception as e:  # pragma: no cover - safety net
             logging.warning("Postgres connection failed: %s", e)
             backend = SQLiteBackend("data/habits.db")
     elif os.getenv("APP_MODE") == "prod":
-        backend = SQLiteBackend("data/habits.db")
+        backend = SQLiteBackend(
+            "data/habits.db",
+            pooled=os.getenv("SQLITE_POOL", "1") == "1",
+            maxconn=int(os.getenv("SQLITE_POOL_MAX", "8")),
+        )
     else:
-        backend = JSONBackend(json_path)
+        backend = JSONBackend(
+            json_path, journal=os.getenv("HABIT_JSON_JOURNAL") == "1"
+        )
 
     get_backend._cache[key] = backend
     return backend
@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app as flask_app_module
+import storage
+
+
+class FakeCompletions(BaseHTTPRequestHandler):
+    """Answers /chat/completions once ``release`` is set."""
+
+    release = threading.Event()
+    requests = []
+    delay = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(body)
+        self.release.wait(timeout=10)
+        time.sleep(self.delay)
+        payload = json.dumps(
+            {
+                "id": "cmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": " AI prompt "},
+                    }
+                ],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def completion_server(tmp_path, monkeypatch):
+    FakeCompletions.release = threading.Event()
+    FakeCompletions.requests = []
+    FakeCompletions.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCompletions)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(flask_app_module, "AI_PROMPTS", flask_app_module.PromptPrecomputer())
+    monkeypatch.setattr(
+        flask_app_module, "PROMPT_CACHE", storage.PromptCache(tmp_path / "ai.json")
+    )
+    monkeypatch.setattr(flask_app_module, "AI_GUARD", flask_app_module.AIGuard())
+    yield FakeCompletions
+    FakeCompletions.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(flask_app_module, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(flask_app_module, "CONFIG_FILE", tmp_path / "config.json")
+    return flask_app_module.app.test_client()
+
+
+def test_journal_serves_base_prompt_then_swaps_in_ai(client, completion_server):
+    client.post("/mood", data={"score": "4"})
+    base = flask_app_module.generate_journal_prompt(
+        flask_app_module.get_storage_backend().iter_entries()
+    )
+    key = flask_app_module.prompt_key(base)
+
+    # The completion server is still holding the request: no blocking here.
+    page = client.get("/journal").get_data(as_text=True)
+    assert "7-day average mood is 4.0/5" in page
+    assert f"/journal/prompt/{key}" in page
+    assert client.get(f"/journal/prompt/{key}").status_code == 204
+
+    completion_server.release.set()
+    deadline = time.monotonic() + 10
+    while flask_app_module.AI_PROMPTS.get(key) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    fragment = client.get(f"/journal/prompt/{key}")
+    assert fragment.status_code == 200
+    assert "AI prompt" in fragment.get_data(as_text=True)
+    assert "hx-get" not in fragment.get_data(as_text=True)
+
+    page = client.get("/journal").get_data(as_text=True)
+    assert "AI prompt" in page
+    assert "/journal/prompt/" not in page
+    # Scheduled once on /mood; /journal reused the same job.
+    assert len(completion_server.requests) == 1
+
+
+def test_unknown_prompt_job_stops_polling(client, completion_server):
+    assert client.get("/journal/prompt/deadbeef").status_code == 286
+
+
+def test_repeat_visits_hit_the_prompt_cache(client, completion_server):
+    completion_server.release.set()
+    base = "Mood Journal Prompt for today"
+    assert flask_app_module.enrich_prompt_with_ai(base) == "AI prompt"
+    assert len(completion_server.requests) == 1
+
+    # A fresh process (empty in-memory results) still skips the API call.
+    cache = flask_app_module.PROMPT_CACHE
+    reloaded = storage.PromptCache(cache.path)
+    assert reloaded.get(flask_app_module.ai_cache_key(base)) == "AI prompt"
+    for _ in range(5):
+        assert flask_app_module.enrich_prompt_with_ai(base) == "AI prompt"
+    assert len(completion_server.requests) == 1
+
+    assert flask_app_module.enrich_prompt_with_ai(base, refresh=True) == "AI prompt"
+    assert len(completion_server.requests) == 2
+
+    stats = client.get("/journal/cache").get_json()
+    assert stats["hits"] == 5
+    assert stats["size"] == 1
+
+
+def test_journal_page_served_from_cache(client, completion_server):
+    completion_server.release.set()
+    client.post("/mood", data={"score": "3"})
+    prompt = flask_app_module.generate_journal_prompt(
+        flask_app_module.get_storage_backend().iter_entries()
+    )
+    flask_app_module.enrich_prompt_with_ai(prompt)
+    requests = len(completion_server.requests)
+    # New precomputer: only the persistent cache can answer synchronously.
+    flask_app_module.AI_PROMPTS = flask_app_module.PromptPrecomputer()
+    page = client.get("/journal").get_data(as_text=True)
+    assert "AI prompt" in page
+    assert "/journal/prompt/" not in page
+    assert len(completion_server.requests) == requests
+
+
+def test_prompt_cache_ttl_and_size(tmp_path, monkeypatch):
+    cache = storage.PromptCache(tmp_path / "c.json", ttl=60, maxsize=2)
+    now = [1000.0]
+    monkeypatch.setattr(storage.time, "time", lambda: now[0])
+    for i, key in enumerate("abc"):
+        now[0] += 1
+        cache.put(key, f"v{i}")
+    assert cache.get("a") is None
+    assert cache.get("c") == "v2"
+    now[0] += 61
+    assert cache.get("c") is None
+    assert cache.stats() == {
+        "hits": 1, "misses": 2, "expired": 1, "size": 2, "hit_rate": 0.333
+    }
+
+
+def test_breaker_opens_on_timeouts_and_recovers(client, completion_server, monkeypatch):
+    guard = flask_app_module.AIGuard(timeout=0.2, threshold=2, cooldown=0.5)
+    monkeypatch.setattr(flask_app_module, "AI_GUARD", guard)
+    monkeypatch.setattr(flask_app_module, "PROMPT_CACHE", None)
+    completion_server.release.set()
+    completion_server.delay = 1.0
+
+    for attempt in range(2):
+        start = time.monotonic()
+        assert flask_app_module.enrich_prompt_with_ai("base") == "base"
+        assert time.monotonic() - start < 0.8
+    assert guard.stats()["state"] == "open"
+    assert guard.stats()["timeouts"] == 2
+
+    # Open: no request reaches the server and the fallback is immediate.
+    sent = len(completion_server.requests)
+    start = time.monotonic()
+    assert flask_app_module.enrich_prompt_with_ai("base") == "base"
+    assert time.monotonic() - start < 0.05
+    assert len(completion_server.requests) == sent
+    assert guard.stats()["short_circuited"] == 1
+
+    completion_server.delay = 0.0
+    # Let the abandoned slow calls drain and the cooldown pass.
+    deadline = time.monotonic() + 5
+    while guard.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.6)
+    assert flask_app_module.enrich_prompt_with_ai("base") == "AI prompt"
+    status = client.get("/journal/ai-status").get_json()
+    assert status["state"] == "closed"
+    assert status["opens"] == 1
+    assert status["successes"] == 1
+
+
+def test_bulkhead_turns_away_excess_calls(completion_server, monkeypatch):
+    guard = flask_app_module.AIGuard(max_concurrency=1, timeout=5, threshold=5)
+    monkeypatch.setattr(flask_app_module, "AI_GUARD", guard)
+    monkeypatch.setattr(flask_app_module, "PROMPT_CACHE", None)
+    completion_server.release.set()
+    completion_server.delay = 0.5
+
+    results = []
+    slow = threading.Thread(
+        target=lambda: results.append(flask_app_module.enrich_prompt_with_ai("a"))
+    )
+    slow.start()
+    deadline = time.monotonic() + 5
+    while not completion_server.requests and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    start = time.monotonic()
+    assert flask_app_module.enrich_prompt_with_ai("b") == "b"
+    assert time.monotonic() - start < 0.1
+    slow.join()
+    assert results == ["AI prompt"]
+    stats = guard.stats()
+    assert stats["rejected"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["state"] == "closed"
@@ -0,0 +1,176 @@
+import datetime
+import json
+import re
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import analytics
+import app
+import storage
+
+CONFIG = {"med": {"label": "Meditation"}, "yoga": {"label": "Yoga"}}
+TODAY = datetime.date(2025, 1, 7)
+
+
+def day(offset):
+    return str(TODAY + datetime.timedelta(days=offset))
+
+
+def test_load_builds_dense_matrix():
+    data = {
+        day(-2): {"med": {"duration": 5}, "mood": 3},
+        day(0): {"yoga": {"duration": 20}, "other": {"duration": 1}},
+    }
+    history = analytics.History.load(data, CONFIG)
+    assert history.base == TODAY.toordinal() - 2
+    assert history.durations.tolist() == [[5, 0], [0, 0], [0, 20]]
+    assert history.moods.tolist() == [3, analytics.EMPTY_MOOD, analytics.EMPTY_MOOD]
+
+
+def test_empty_history():
+    history = analytics.History.load({}, CONFIG)
+    today = TODAY.toordinal()
+    assert history.averages(today - 6, today) == [0, 0]
+    current, longest = history.streaks(today)
+    assert current.tolist() == [0, 0] and longest.tolist() == [0, 0]
+    assert history.mood_summary(today) == {
+        "weekly_avg": 0,
+        "30d_avg": 0,
+        "overall_avg": 0,
+    }
+    assert history.mood_series() == []
+
+
+def test_streaks_run_length_encoded():
+    data = {day(-9): {"med": {"duration": 1}}, day(-8): {"med": {"duration": 1}}}
+    data.update({day(-i): {"med": {"duration": 2}} for i in range(3)})
+    data[day(1)] = {"yoga": {"duration": 5}}  # future days don't count
+    history = analytics.History.load(data, CONFIG)
+    current, longest = history.streaks(TODAY.toordinal())
+    assert current.tolist() == [3, 0]
+    assert longest.tolist() == [3, 0]
+
+
+def test_weekly_and_monthly_totals():
+    data = {
+        "2025-01-30": {"med": {"duration": 1}},
+        "2025-02-01": {"med": {"duration": 2}},
+        "2025-02-03": {"med": {"duration": 4}, "yoga": {"duration": 8}},
+    }
+    history = analytics.History.load(data, CONFIG)
+    start = storage.to_day_number("2025-01-27")
+    end = storage.to_day_number("2025-02-09")
+    weeks, totals = history.weekly_totals(start, end)
+    assert [storage.from_day_number(int(w)) for w in weeks] == [
+        "2025-01-27",
+        "2025-02-03",
+    ]
+    assert totals.tolist() == [[3, 0], [4, 8]]
+    months, totals = history.monthly_totals(start, end)
+    assert months.tolist() == [2025 * 12, 2025 * 12 + 1]
+    assert totals.tolist() == [[1, 0], [6, 8]]
+    rates = history.completion_rates(start, end)
+    assert rates.tolist() == pytest.approx([3 / 14, 1 / 14])
+
+
+def test_matches_python_recompute(monkeypatch, tmp_path):
+    rng = random.Random(7)
+    records = []
+    for offset in range(-400, 3):
+        for key in CONFIG:
+            if rng.random() < 0.8:
+                records.append(
+                    {"date": day(offset), "habit": key, "duration": rng.randint(1, 30)}
+                )
+        if rng.random() < 0.7:
+            records.append({"date": day(offset), "mood": rng.randint(1, 5)})
+
+    class FixedDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return TODAY
+
+    monkeypatch.setattr(app.datetime, "date", FixedDate)
+    monkeypatch.setattr(app, "load_config", lambda: CONFIG)
+    db = storage.SQLiteBackend(str(tmp_path / "h.db"))
+    db.import_entries(records)
+
+    stats = app.calculate_habit_stats(db.iter_entries(), app.get_week_range())
+    streaks = db.get_streaks(tuple(CONFIG), str(TODAY))
+    for key in CONFIG:
+        assert stats[key]["streak"] == streaks[key]["streak"]
+
+    mood = app.calculate_mood_stats(db.iter_entries(kinds=("mood",)))
+    assert {k: v for k, v in mood.items() if k != "series"} == db.get_mood_summary(
+        str(TODAY), True
+    )
+    assert mood["series"] == db.get_mood_series()
+
+
+def test_downsample_keeps_ends_and_extremes():
+    x = np.arange(1000)
+    y = np.full(1000, 3)
+    y[500] = 5
+    y[700] = 1
+    keep = analytics.downsample(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert list(keep) == sorted(set(keep))
+    assert 500 in keep and 700 in keep
+    assert list(analytics.downsample(x[:10], y[:10], 50)) == list(range(10))
+
+
+def test_buckets():
+    data = {"2025-01-06": {"med": {"duration": 3}}, "2025-01-14": {"med": {"duration": 4}}}
+    history = analytics.History.load(data, CONFIG)
+    start = storage.to_day_number("2025-01-06")
+    keys, totals = history.buckets(start, start + 13, "week")
+    assert totals[:, 0].tolist() == [3, 4]
+    keys, totals = history.buckets(start, start + 13, "day")
+    assert len(keys) == 14 and totals[:, 0].sum() == 7
+    with pytest.raises(ValueError):
+        history.buckets(start, start, "fortnight")
+
+
+def route_client(tmp_path, monkeypatch, days):
+    monkeypatch.setattr(app, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(app, "CONFIG_FILE", tmp_path / "config.json")
+    today = datetime.date.today()
+    records = []
+    for offset in range(days):
+        date = str(today - datetime.timedelta(days=offset))
+        records.append({"date": date, "habit": "med", "duration": 10})
+        records.append({"date": date, "mood": offset % 5 + 1})
+    client = app.app.test_client()
+    body = "\n".join(json.dumps(r) for r in records)
+    assert client.post("/import", data=body).status_code == 200
+    return client
+
+
+@pytest.mark.parametrize(
+    "range_name, bars",
+    [("week", 7), ("month", 30), ("quarter", range(13, 15)), ("year", range(52, 55))],
+)
+def test_analytics_ranges(tmp_path, monkeypatch, range_name, bars):
+    client = route_client(tmp_path, monkeypatch, 400)
+    res = client.get(f"/analytics?range={range_name}")
+    assert res.status_code == 200
+    labels = re.search(r"labels: (\[.*?\])", res.get_data(as_text=True)).group(1)
+    count = len(json.loads(labels))
+    assert count in bars if isinstance(bars, range) else count == bars
+
+
+def test_analytics_page_size_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "MOOD_CHART_POINTS", 60)
+    client = route_client(tmp_path, monkeypatch, 3 * 365)
+    res = client.get("/analytics?range=all")
+    assert res.status_code == 200
+    text = res.get_data(as_text=True)
+    assert "<strong>All</strong>" in text
+    mood = re.search(r"data: (\[[\d, ]*\]),\s*borderColor", text).group(1)
+    assert len(json.loads(mood)) == 60
+    assert len(text) < 30_000
+    assert client.get("/analytics?range=decade").status_code == 400
@@ -0,0 +1,133 @@
+import datetime
+import json
+
+import pytest
+
+import app as flask_app_module
+
+RECORDS = [
+    {"date": "2025-06-16", "habit": "med", "duration": 10, "note": "calm"},
+    {"date": "2025-06-16", "habit": "read", "duration": 5},
+    {"date": "2025-06-16", "mood": 4},
+    {"date": "2025-06-18", "habit": "med", "duration": 12},
+    {"date": "2025-06-20", "mood": 2},
+    {"date": "2025-06-23", "habit": "med", "duration": 8},
+]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(flask_app_module, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(flask_app_module, "CONFIG_FILE", tmp_path / "config.json")
+    client = flask_app_module.app.test_client()
+    body = "\n".join(json.dumps(r) for r in RECORDS)
+    assert client.post("/import", data=body).status_code == 200
+    return client
+
+
+def test_entries_cursor_pagination(client):
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = "/api/v1/entries?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        res = client.get(url)
+        assert res.status_code == 200
+        body = res.get_json()
+        assert len(body["entries"]) <= 2
+        seen += body["entries"]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == 3
+    assert seen[0] == {
+        "date": "2025-06-16", "habit": "med", "duration": 10, "note": "calm"
+    }
+    assert seen[1] == {"date": "2025-06-16", "habit": "read", "duration": 5}
+    assert [e["date"] for e in seen] == sorted(r["date"] for r in RECORDS)
+
+
+def test_entries_range_kinds_and_fields(client):
+    res = client.get(
+        "/api/v1/entries?start=2025-06-17&end=2025-06-22&kinds=habit&fields=date,duration"
+    )
+    assert res.get_json() == {
+        "entries": [{"date": "2025-06-18", "duration": 12}],
+        "next_cursor": None,
+    }
+    assert b" " not in res.data
+    assert client.get("/api/v1/entries?fields=bogus").status_code == 400
+    assert client.get("/api/v1/entries?kinds=sleep").status_code == 400
+    assert client.get("/api/v1/entries?cursor=nope").status_code == 400
+    assert client.get("/api/v1/entries?start=2025-13-01").status_code == 400
+
+
+def test_grid_omits_empty_days(client):
+    res = client.get("/api/v1/grid?start=2025-06-16&end=2025-06-22")
+    assert res.get_json() == {
+        "start": "2025-06-16",
+        "end": "2025-06-22",
+        "days": {
+            "2025-06-16": {
+                "med": {"duration": 10, "note": "calm"},
+                "read": {"duration": 5},
+                "mood": 4,
+            },
+            "2025-06-18": {"med": {"duration": 12}},
+            "2025-06-20": {"mood": 2},
+        },
+    }
+    res = client.get(
+        "/api/v1/grid?start=2025-06-16&end=2025-06-22&fields=duration&habits=med"
+    )
+    assert res.get_json()["days"] == {
+        "2025-06-16": {"med": {"duration": 10}},
+        "2025-06-18": {"med": {"duration": 12}},
+    }
+    assert client.get("/api/v1/grid?start=2024-01-01&end=2025-06-22").status_code == 400
+
+
+def test_grid_etag_tracks_only_its_range(client):
+    url = "/api/v1/grid?start=2025-06-16&end=2025-06-22"
+    etag = client.get(url).headers["ETag"]
+    res = client.get(url, headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["X-Storage-Calls"] == "1"
+
+    client.post("/log", data={"habit": "med", "duration": "3", "date": "2025-06-30"})
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    client.post("/log", data={"habit": "med", "duration": "3", "date": "2025-06-17"})
+    res = client.get(url, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.get_json()["days"]["2025-06-17"] == {"med": {"duration": 3}}
+
+
+def test_mood_series_pages(client):
+    body = client.get("/api/v1/mood?limit=1").get_json()
+    assert body["series"] == [["2025-06-16", 4]]
+    body = client.get(f"/api/v1/mood?limit=1&cursor={body['next_cursor']}").get_json()
+    assert body == {"series": [["2025-06-20", 2]], "next_cursor": None}
+
+
+def test_stats(client, monkeypatch):
+    class FixedDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return cls(2025, 6, 18)
+
+    monkeypatch.setattr(flask_app_module.datetime, "date", FixedDate)
+    res = client.get(
+        "/api/v1/stats?start=2025-06-16&end=2025-06-22"
+        "&fields=streak,total,days,avg_duration,completion_rate"
+    )
+    body = res.get_json()
+    assert body["habits"]["med"] == {
+        "streak": 1,
+        "total": 22,
+        "days": 2,
+        "avg_duration": 11.0,
+        "completion_rate": round(2 / 7, 3),
+    }
+    assert body["habits"]["read"]["total"] == 5
+    assert body["mood"]["overall_avg"] == 3.0
@@ -0,0 +1,96 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import tracemalloc
+
+import pytest
+
+import app as flask_app_module
+import storage
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(flask_app_module, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(flask_app_module, "CONFIG_FILE", tmp_path / "config.json")
+    return flask_app_module.app.test_client()
+
+
+def _seed(client):
+    client.post("/import", data=json.dumps([
+        {"date": "2025-06-18", "habit": "med", "duration": 10, "note": "calm, quiet"},
+        {"date": "2025-06-19", "habit": "read", "duration": 25},
+        {"date": "2025-06-19", "mood": 4},
+        {"date": "2025-06-21", "habit": "med", "duration": 5},
+    ]))
+
+
+def test_export_csv_range(client):
+    _seed(client)
+    resp = client.get("/export?start=2025-06-18&end=2025-06-19")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows == [
+        ["date", "kind", "habit", "duration", "note", "score"],
+        ["2025-06-18", "habit", "med", "10", "calm, quiet", ""],
+        ["2025-06-19", "habit", "read", "25", "", ""],
+        ["2025-06-19", "mood", "", "", "", "4"],
+    ]
+
+
+def test_export_ndjson_gzip_round_trips_through_import(client, tmp_path):
+    _seed(client)
+    resp = client.get("/export?all=1&format=ndjson&gzip=1")
+    assert resp.mimetype == "application/gzip"
+    assert resp.headers["Content-Disposition"].endswith(".ndjson.gz")
+    text = gzip.decompress(resp.get_data()).decode()
+    records = [json.loads(line) for line in text.splitlines()]
+    assert records[-1] == {"date": "2025-06-21", "habit": "med", "duration": 5, "note": ""}
+
+    copy = storage.JSONBackend(tmp_path / "copy.json")
+    copy.import_entries(storage.parse_entries(text))
+    original = flask_app_module.get_storage_backend()
+    assert list(copy.iter_entries()) == list(original.iter_entries())
+
+
+def test_export_rejects_bad_parameters(client):
+    assert client.get("/export?start=june").status_code == 400
+    assert client.get("/export?format=xml").status_code == 400
+
+
+def test_weekly_export_unchanged(client):
+    resp = client.get("/export")
+    assert resp.mimetype == "text/csv"
+    assert resp.get_data(as_text=True).startswith("Habit,")
+
+
+def _peak_export_memory(backend, years):
+    start = datetime.date(2020, 1, 1)
+    days = [start + datetime.timedelta(days=i) for i in range(365 * years)]
+    backend.import_entries(
+        {"date": str(day), "habit": f"h{h:02}", "duration": h + 1, "note": "n"}
+        for day in days
+        for h in range(50)
+    )
+    tracemalloc.start()
+    try:
+        total = 0
+        for chunk in flask_app_module.export_chunks(
+            flask_app_module.export_lines(backend.iter_entries(), "csv"), compress=True
+        ):
+            total += len(chunk)
+        return tracemalloc.get_traced_memory()[1], total
+    finally:
+        tracemalloc.stop()
+
+
+def test_export_memory_stays_flat(tmp_path):
+    small, _ = _peak_export_memory(storage.SQLiteBackend(tmp_path / "1.db"), 1)
+    large, size = _peak_export_memory(storage.SQLiteBackend(tmp_path / "3.db"), 3)
+    assert size > 0
+    # Three times the rows (~55k) without a matching rise in peak memory.
+    assert large < small * 1.5 + 256 * 1024
+    assert large < 4 * 1024 * 1024
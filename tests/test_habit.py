@@ -31,3 +31,24 @@ def test_log_unknown_habit(tmp_path):
         assert "Unknown habit key" in result.output
     finally:
         habit.DATA_FILE = orig_file
+
+
+def test_import_command(tmp_path, monkeypatch):
+    """`habit import` bulk-loads records into the storage backend."""
+    import json
+    import storage
+
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("APP_MODE", raising=False)
+    orig_file = habit.DATA_FILE
+    habit.DATA_FILE = str(tmp_path / "habit.json")
+    src = tmp_path / "backfill.json"
+    src.write_text(json.dumps([{"date": "2024-03-01", "habit": "med", "duration": 3}]))
+    try:
+        result = runner.invoke(habit.app, ["import", str(src)])
+        assert result.exit_code == 0
+        assert "Imported 1" in result.output
+        data = storage.JSONBackend(habit.DATA_FILE).load_all()
+        assert data["2024-03-01"]["med"]["duration"] == 3
+    finally:
+        habit.DATA_FILE = orig_file
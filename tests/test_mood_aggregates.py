@@ -0,0 +1,52 @@
+import datetime
+import logging
+import random
+
+import storage
+
+
+TODAY = datetime.date(2025, 3, 31)
+
+
+def full_recompute(db):
+    return storage.summarize_moods(db.iter_entries(kinds=("mood",)), TODAY)
+
+
+def test_mood_summary_tracks_writes_and_overwrites(tmp_path):
+    rng = random.Random(3)
+    backends = [
+        storage.JSONBackend(tmp_path / "log.json", journal=True, compact_every=30),
+        storage.SQLiteBackend(db_path=tmp_path / "m.db"),
+    ]
+    for db in backends:
+        db.get_mood_summary(TODAY)  # build before writes
+    for _ in range(200):
+        day = str(TODAY - datetime.timedelta(days=rng.randrange(-2, 60)))
+        score = rng.randint(1, 5)
+        for db in backends:
+            db.save_mood(day, score)
+    for db in backends:
+        assert db.get_mood_summary(TODAY) == full_recompute(db)
+        assert db.get_mood_summary(TODAY, verify=True) == full_recompute(db)
+
+
+def test_mood_summary_after_import(tmp_path):
+    db = storage.SQLiteBackend(db_path=tmp_path / "m.db")
+    db.save_mood("2025-03-30", 1)
+    db.import_entries([
+        {"date": "2025-03-30", "mood": 5},
+        {"date": "2025-01-01", "mood": 2},
+    ])
+    assert db.get_mood_summary(TODAY) == {
+        "weekly_avg": 5, "30d_avg": 5, "overall_avg": 3.5,
+    }
+
+
+def test_verify_repairs_drifted_totals(tmp_path, caplog):
+    db = storage.SQLiteBackend(db_path=tmp_path / "m.db")
+    db.save_mood("2025-03-30", 4)
+    db._run(lambda cur: cur.execute("UPDATE mood_totals SET total = 99"))
+    caplog.set_level(logging.WARNING)
+    assert db.get_mood_summary(TODAY, verify=True)["overall_avg"] == 4
+    assert "drifted" in caplog.text
+    assert db.get_mood_summary(TODAY)["overall_avg"] == 4
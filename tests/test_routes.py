@@ -214,22 +214,33 @@ def test_download_journal(tmp_path):
 
 
 def test_ai_model_toggle(monkeypatch):
+    monkeypatch.setattr(flask_app_module, "PROMPT_CACHE", None)
     monkeypatch.setenv("AI_MODEL", "gpt-3.5-turbo")
     monkeypatch.setenv("OPENAI_API_KEY", "test-key")
 
     called = {}
 
+    class FakeMessage:
+        content = "ok"
+
     class FakeChoice:
-        message = {"content": "ok"}
+        message = FakeMessage
 
     class FakeResponse:
         choices = [FakeChoice]
 
-    def fake_create(model, messages):
-        called["model"] = model
-        return FakeResponse()
+    class FakeClient:
+        def __init__(self, api_key, **options):
+            self.chat = self
+            self.completions = self
+
+        def create(self, model, messages):
+            called["model"] = model
+            return FakeResponse()
+
+    import openai
 
-    monkeypatch.setattr(flask_app_module.openai.ChatCompletion, "create", fake_create)
+    monkeypatch.setattr(openai, "OpenAI", FakeClient)
     result = flask_app_module.enrich_prompt_with_ai("Reflect on your week.")
     assert isinstance(result, str)
     assert called.get("model") == "gpt-3.5-turbo"
@@ -259,3 +270,271 @@ def test_grid_previous_week(tmp_path):
         assert "42&nbsp;min" in res.get_data(as_text=True)
     finally:
         restore(orig_data, orig_config)
+
+
+def test_import_route(tmp_path):
+    client, orig_data, orig_config = make_client(tmp_path)
+    try:
+        body = "\n".join([
+            json.dumps({"date": "2024-03-01", "habit": "med", "duration": 12}),
+            json.dumps({"date": "2024-03-01", "mood": 5}),
+        ])
+        res = client.post("/import", data=body, content_type="application/x-ndjson")
+        assert res.get_json() == {"status": "ok", "imported": 2}
+        data = read_json(flask_app_module.DATA_FILE)
+        assert data["2024-03-01"] == {"med": {"duration": 12, "note": ""}, "mood": 5}
+
+        res = client.post("/import", data='[{"date": "nope", "mood": 3}]')
+        assert res.status_code == 400
+    finally:
+        restore(orig_data, orig_config)
+
+
+def test_request_loader_dedupes_reads(tmp_path, monkeypatch):
+    client, orig_data, orig_config = make_client(tmp_path)
+    try:
+        client.post("/mood", data={"score": "4"})
+        real_load_config = flask_app_module.load_config
+        config_calls = []
+
+        def counting_load_config():
+            config_calls.append(1)
+            return real_load_config()
+
+        monkeypatch.setattr(flask_app_module, "load_config", counting_load_config)
+        resp = client.get("/")
+        assert resp.status_code == 200
+        assert len(config_calls) == 1
+        # last write, week range, data version, streaks, mood summary
+        assert resp.headers["X-Storage-Calls"] == "5"
+
+        config_calls.clear()
+        resp = client.get("/analytics")
+        assert resp.status_code == 200
+        assert len(config_calls) == 1
+        # last write, one entry stream for the range
+        assert resp.headers["X-Storage-Calls"] == "2"
+    finally:
+        restore(orig_data, orig_config)
+
+
+def test_request_loader_slices_loaded_history(tmp_path):
+    _, orig_data, orig_config = make_client(tmp_path)
+    try:
+        backend = flask_app_module.get_storage_backend()
+        today = datetime.date.today()
+        backend.save_habit(str(today), "med", 5, "")
+        with flask_app_module.app.test_request_context("/"):
+            loader = flask_app_module.request_data()
+            week = flask_app_module.get_week_range()
+            loader.history()
+            sliced = loader.week(week)
+            assert loader.calls == 1
+            assert sliced == backend.get_range(str(week[0]), str(week[-1]))
+            assert flask_app_module.request_data() is loader
+    finally:
+        restore(orig_data, orig_config)
+
+
+def test_grid_fragment_cache_and_etag(tmp_path):
+    client, orig_data, orig_config = make_client(tmp_path)
+    try:
+        flask_app_module.GRID_CACHE.clear()
+        first = client.get("/grid?offset=-7")
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+
+        again = client.get("/grid?offset=-7", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.get_data() == b""
+        # Only the data version was looked up; the week itself was not read.
+        assert again.headers["X-Storage-Calls"] == "1"
+
+        hits = flask_app_module.GRID_CACHE.hits
+        assert client.get("/grid?offset=-7").get_data() == first.get_data()
+        assert flask_app_module.GRID_CACHE.hits == hits + 1
+
+        # A write to another week leaves this one's ETag alone...
+        today = str(datetime.date.today())
+        client.post("/log", data={"habit": "med", "duration": "5", "date": today})
+        assert client.get("/grid?offset=-7").headers["ETag"] == etag
+        # ...while a write inside the week changes it.
+        day = flask_app_module.get_week_range(-7)[2]
+        client.post("/log", data={"habit": "med", "duration": "5", "date": str(day)})
+        changed = client.get("/grid?offset=-7", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert "5&nbsp;min" in changed.get_data(as_text=True)
+    finally:
+        restore(orig_data, orig_config)
+
+
+def test_fragment_cache_evicts_least_recent():
+    cache = flask_app_module.FragmentCache(maxsize=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+class CountingBackend:
+    """Wraps a backend and records the name of every method called."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.backend, name)
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return method(*args, **kwargs)
+
+        return call
+
+
+@pytest.mark.parametrize("path", ["/", "/analytics", "/export"])
+def test_conditional_get_skips_storage(tmp_path, monkeypatch, path):
+    client, orig_data, orig_config = make_client(tmp_path)
+    try:
+        backend = CountingBackend(flask_app_module.get_storage_backend())
+        monkeypatch.setattr(flask_app_module, "get_storage_backend", lambda: backend)
+        client.post("/mood", data={"score": "3"})
+
+        first = client.get(path)
+        assert first.status_code == 200
+        assert first.headers["Cache-Control"] == "no-cache"
+        assert first.last_modified is not None
+        full_calls = len(backend.calls)
+
+        backend.calls.clear()
+        cached = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+        assert cached.status_code == 304
+        assert backend.calls == ["get_last_write"]
+        assert full_calls > len(backend.calls)
+
+        stamp = first.headers["Last-Modified"]
+        by_date = client.get(path, headers={"If-Modified-Since": stamp})
+        assert by_date.status_code == 304
+
+        client.post("/mood", data={"score": "5"})
+        changed = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != first.headers["ETag"]
+    finally:
+        restore(orig_data, orig_config)
+
+
+def test_settings_save_invalidates_dashboard(tmp_path):
+    client, orig_data, orig_config = make_client(tmp_path)
+    try:
+        etag = client.get("/").headers["ETag"]
+        client.post("/settings", data={"label_med": "Sit"})
+        resp = client.get("/", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert "Sit" in resp.get_data(as_text=True)
+    finally:
+        restore(orig_data, orig_config)
+
+
+def test_download_journal_zip_cached_with_ranges(tmp_path, monkeypatch):
+    import io
+    import threading
+    import zipfile
+
+    journal = tmp_path / "journal.md"
+    journal.write_text("## 2025-06-19\n" + "calm day\n" * 500)
+    monkeypatch.setattr(flask_app_module, "JOURNAL_FILE", journal)
+    monkeypatch.chdir(tmp_path)
+    builds = flask_app_module._journal_zip["builds"]
+
+    bodies, errors = [], []
+
+    def download():
+        try:
+            res = flask_app_module.app.test_client().get("/download-journal?format=zip")
+            assert res.status_code == 200
+            bodies.append((res.get_data(), res.headers["ETag"]))
+        except Exception as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=download) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(set(bodies)) == 1
+    assert flask_app_module._journal_zip["builds"] == builds + 1
+    assert not (tmp_path / "journal.zip").exists()
+
+    data, etag = bodies[0]
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.read("journal.md") == journal.read_bytes()
+
+    client = flask_app_module.app.test_client()
+    part = client.get("/download-journal?format=zip", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206
+    assert part.get_data() == data[10:20]
+    cached = client.get("/download-journal?format=zip", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    journal.write_text("## 2025-06-20\nnew entry\n")
+    fresh = client.get("/download-journal?format=zip", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert flask_app_module._journal_zip["builds"] == builds + 2
+
+
+def test_journal_history_pages_and_infinite_scroll(tmp_path, monkeypatch):
+    journal = tmp_path / "journal.md"
+    journal.write_text(
+        "".join(f"\n## 2025-01-{day:02}\nentry {day}\n" for day in range(1, 26))
+    )
+    monkeypatch.setattr(flask_app_module, "JOURNAL_FILE", journal)
+    monkeypatch.setattr(flask_app_module, "JOURNAL_PAGE_SIZE", 10)
+    client = flask_app_module.app.test_client()
+
+    first = client.get("/journal-history").get_data(as_text=True)
+    assert "2025-01-25" in first and "2025-01-16" in first
+    assert "2025-01-15" not in first
+    assert "Page 1 of 3" in first
+    assert 'hx-trigger="revealed"' in first
+
+    last = client.get("/journal-history?page=3", headers={"HX-Request": "true"})
+    body = last.get_data(as_text=True)
+    assert "<html" not in body
+    assert "entry 5" in body and "entry 1" in body
+    assert "hx-get" not in body
+
+    client.post("/journal-entry", data={"entry": "new thoughts"})
+    newest = client.get("/journal-history").get_data(as_text=True)
+    assert "new thoughts" in newest
+    assert "Page 1 of 3" in newest
+
+
+def test_year_heatmap(tmp_path):
+    client, orig_data, orig_config = make_client(tmp_path)
+    try:
+        days = ["2025-01-06", "2025-01-07", "2025-01-08", "2025-02-03"]
+        body = "\n".join(
+            json.dumps({"date": d, "habit": "med", "duration": 5}) for d in days
+        )
+        client.post("/import", data=body)
+        resp = client.get("/heatmap?year=2025")
+        assert resp.status_code == 200
+        assert resp.headers["X-Storage-Calls"] == "2"
+        assert len(resp.data) < 16_000
+        text = resp.get_data(as_text=True)
+        assert f'data-bits="{(0b111 << 5 | 1 << 33):x}"' in text
+        assert "4 days · longest run 3 · best week 3/7" in text
+        rows = flask_app_module.year_heatmap(
+            {"med": {"label": "Meditation"}}, {"med": 0b111 << 5 | 1 << 33}, 2025
+        )
+        assert rows[0]["months"][:3] == [3, 1, 0]
+        assert client.get("/heatmap?year=nope").status_code == 400
+    finally:
+        restore(orig_data, orig_config)
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+import app as flask_app_module
+import storage
+from storage import JSONBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["json", "journal", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBackend(db_path=tmp_path / "s.db")
+    return JSONBackend(tmp_path / "log.json", journal=request.param == "journal")
+
+
+def test_search_tracks_saves_and_deletes(backend):
+    backend.save_habit("2025-06-18", "med", 10, "Calm morning by the lake")
+    backend.save_habit("2025-06-19", "read", 20, "Read about lakes and rivers")
+    backend.save_habit("2025-06-20", "yoga", 15, "")
+
+    hits = backend.search_notes("lake")
+    # JSON orders by date, FTS5 by rank: compare as a set.
+    assert {(h["date"], h["habit"]) for h in hits} == {
+        ("2025-06-19", "read"),
+        ("2025-06-18", "med"),
+    }
+    assert "[" in hits[0]["snippet"]
+    assert [h["habit"] for h in backend.search_notes("calm lake")] == ["med"]
+
+    backend.save_habit("2025-06-18", "med", 10, "Busy city walk")
+    assert [h["habit"] for h in backend.search_notes("lake")] == ["read"]
+    assert [h["habit"] for h in backend.search_notes("city")] == ["med"]
+
+    backend.delete_habit("2025-06-19", "read")
+    assert backend.search_notes("lake") == []
+    assert backend.search_notes("   ") == []
+
+    backend.import_entries(
+        [{"date": "2025-06-21", "habit": "read", "duration": 5, "note": "lakeside"}]
+    )
+    assert [h["date"] for h in backend.search_notes("lake")] == ["2025-06-21"]
+
+
+def test_json_note_index_persists_across_restarts(tmp_path, monkeypatch):
+    path = tmp_path / "log.json"
+    JSONBackend(path).save_habit("2025-06-18", "med", 10, "quiet garden")
+    assert JSONBackend(path).search_notes("garden")
+    assert path.with_name("log.json.search").exists()
+
+    def no_rebuild(data):
+        raise AssertionError("index rebuilt although data is unchanged")
+
+    monkeypatch.setattr(storage.NoteIndex, "from_data", no_rebuild)
+    assert JSONBackend(path).search_notes("gard")[0]["habit"] == "med"
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_note_search_is_fast_over_many_notes(tmp_path, kind):
+    words = ["river", "garden", "focus", "tired", "sunny", "rain", "friends", "deep"]
+    rows = [
+        {
+            "date": f"{2000 + i // 3650}-{i // 300 % 12 + 1:02}-{i % 28 + 1:02}",
+            "habit": f"h{i % 10}",
+            "duration": 1,
+            "note": f"{words[i % 8]} {words[i // 8 % 8]} note {i}",
+        }
+        for i in range(20000)
+    ]
+    db = (
+        SQLiteBackend(db_path=tmp_path / "big.db")
+        if kind == "sqlite"
+        else JSONBackend(tmp_path / "big.json")
+    )
+    db.import_entries(rows)
+    db.search_notes("warmup")
+    start = time.perf_counter()
+    hits = db.search_notes("garden rain", limit=20)
+    assert time.perf_counter() - start < 0.05
+    assert len(hits) == 20
+
+
+def test_journal_search(tmp_path):
+    journal = storage.JournalStore(tmp_path / "journal.md")
+    journal.append("2025-06-01", "Walked along the river")
+    journal.append("2025-06-02", "Stayed in, rainy day")
+    journal.append("2025-06-03", "River again, then rain")
+    assert [h["date"] for h in journal.search("river")] == ["2025-06-03", "2025-06-01"]
+    assert [h["date"] for h in journal.search("rain riv")] == ["2025-06-03"]
+    with open(journal.path, "a") as f:
+        f.write("\n## 2025-06-04\nriverside picnic\n")
+    assert journal.search("river")[0]["date"] == "2025-06-04"
+    assert "[riverside]" in journal.search("river")[0]["snippet"]
+
+
+def test_search_route(tmp_path, monkeypatch):
+    monkeypatch.setattr(flask_app_module, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(flask_app_module, "CONFIG_FILE", tmp_path / "config.json")
+    monkeypatch.setattr(flask_app_module, "JOURNAL_FILE", tmp_path / "journal.md")
+    client = flask_app_module.app.test_client()
+    client.post(
+        "/log",
+        data={"habit": "med", "duration": "5", "note": "mindful breathing", "date": "2025-06-18"},
+    )
+    client.post("/journal-entry", data={"entry": "Breathing felt easier today"})
+
+    result = client.get("/search?q=breath").get_json()
+    assert [n["habit"] for n in result["notes"]] == ["med"]
+    assert len(result["journal"]) == 1
+    assert client.get("/search?q=").get_json()["notes"] == []
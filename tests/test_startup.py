@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from jinja2 import FileSystemBytecodeCache
+
+import app as flask_app_module
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Generous defaults; tighten per machine with the environment variables.
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.0"))
+IMPORT_MODULE_BUDGET = int(os.getenv("IMPORT_MODULE_BUDGET", "450"))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "modules": len(sys.modules),
+    "heavy": sorted(m for m in ("openai", "psycopg2", "numpy") if m in sys.modules),
+}))
+"""
+
+
+def test_import_app_within_budget(tmp_path):
+    env = {**os.environ, "JINJA_CACHE_DIR": str(tmp_path / "jinja")}
+    env.pop("DATABASE_URL", None)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(out.stdout.splitlines()[-1])
+    assert result["heavy"] == []
+    assert result["seconds"] < IMPORT_TIME_BUDGET, result
+    assert result["modules"] < IMPORT_MODULE_BUDGET, result
+
+
+def test_warm_templates_fills_bytecode_cache(tmp_path, monkeypatch):
+    env = flask_app_module.app.jinja_env
+    monkeypatch.setattr(env, "bytecode_cache", FileSystemBytecodeCache(str(tmp_path)))
+    env.cache.clear()
+    count = flask_app_module.warm_templates()
+    assert count == len(list((ROOT / "templates").glob("*.html")))
+    assert len(list(tmp_path.iterdir())) == count
+    env.cache.clear()
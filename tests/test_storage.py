@@ -1,7 +1,15 @@
+import datetime
+import json
 import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import tracemalloc
 
 import storage
-from storage import SQLiteBackend, get_backend
+from storage import JSONBackend, SQLiteBackend, get_backend
 
 
 def test_sqlite_habit_cycle(tmp_path):
@@ -36,3 +44,564 @@ def test_get_backend_postgres_failure(monkeypatch, caplog):
     backend = get_backend()
     assert isinstance(backend, SQLiteBackend)
     assert "connection failed" in caplog.text
+
+
+def test_json_journal_appends_without_rewriting_snapshot(tmp_path):
+    path = tmp_path / "log.json"
+    db = JSONBackend(path, journal=True)
+    db.save_habit("2025-06-19", "med", 10, "note")
+    db.save_mood("2025-06-19", 4)
+    db.save_habit("2025-06-20", "read", 5)
+    db.delete_habit("2025-06-20", "read")
+
+    assert not path.exists()
+    assert len(db.wal.read_text().splitlines()) == 4
+    data = JSONBackend(path).load_all()
+    assert data["2025-06-19"] == {"med": {"duration": 10, "note": "note"}, "mood": 4}
+    assert data["2025-06-20"] == {}
+
+
+def test_json_journal_compacts_into_snapshot(tmp_path):
+    path = tmp_path / "log.json"
+    db = JSONBackend(path, journal=True, compact_every=3)
+    for day in range(1, 4):
+        db.save_habit(f"2025-06-0{day}", "med", day)
+
+    assert not db.wal.exists()
+    snapshot = json.loads(path.read_text())
+    assert snapshot["2025-06-03"]["med"]["duration"] == 3
+
+    db.save_mood("2025-06-03", 5)
+    assert db.load_all()["2025-06-03"]["mood"] == 5
+
+
+def test_json_journal_ignores_torn_record(tmp_path):
+    path = tmp_path / "log.json"
+    db = JSONBackend(path, journal=True)
+    db.save_habit("2025-06-19", "med", 10)
+    with open(db.wal, "a") as f:
+        f.write('{"op": "habit", "date"')
+    assert db.load_all()["2025-06-19"]["med"]["duration"] == 10
+    db.save_mood("2025-06-19", 3)
+    assert db.load_all()["2025-06-19"]["mood"] == 3
+
+
+def test_json_read_cache_hits_until_file_changes(tmp_path):
+    path = tmp_path / "log.json"
+    db = JSONBackend(path)
+    db.save_habit("2025-06-19", "med", 10)
+    misses = db.cache_misses
+
+    db.load_all()
+    db.get_range("2025-06-16", "2025-06-22")
+    db.get_mood_series()
+    assert db.cache_misses == misses
+    assert db.cache_hits >= 3
+
+    # External writer, e.g. the CLI rewriting the file.
+    path.write_text(json.dumps({"2025-06-19": {"mood": 2}}))
+    assert db.load_all() == {"2025-06-19": {"mood": 2}}
+    assert db.cache_misses == misses + 1
+
+
+def test_json_journal_write_keeps_cache_warm(tmp_path):
+    db = JSONBackend(tmp_path / "log.json", journal=True)
+    db.load_all()
+    db.save_mood("2025-06-19", 4)
+    misses = db.cache_misses
+    assert db.load_all()["2025-06-19"]["mood"] == 4
+    assert db.cache_misses == misses
+
+
+def test_sqlite_pooled_checks_out_wal_connections(tmp_path):
+    db = SQLiteBackend(db_path=tmp_path / "p.db", pooled=True)
+    with db._connection() as first, db._connection() as second:
+        assert first is not second
+        mode = first.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+    with db._connection() as again:
+        assert again in (first, second)
+    assert db.pool.size == 2
+    db.close()
+
+
+def test_sqlite_pool_is_bounded_with_thread_per_request(tmp_path):
+    db = SQLiteBackend(db_path=tmp_path / "p.db", pooled=True, maxconn=4)
+    db.save_mood("2025-06-19", 4)
+    errors = []
+
+    def request():
+        try:
+            db.get_mood_series()
+        except Exception as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+
+    for _ in range(30):
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert not errors
+    assert db.pool.size <= 4
+    db.close()
+    assert db.pool.size == 0
+
+
+def test_sqlite_pooled_reads_while_writer_holds_lock(tmp_path):
+    db = SQLiteBackend(db_path=tmp_path / "p.db", pooled=True)
+    db.save_mood("2025-06-19", 4)
+    writer = sqlite3.connect(tmp_path / "p.db", timeout=0)
+    writer.execute("BEGIN EXCLUSIVE")
+    writer.execute("INSERT INTO mood_log (day, score) VALUES (739422, 1)")
+
+    result = []
+    reader = threading.Thread(target=lambda: result.append(db.get_mood_series()))
+    reader.start()
+    reader.join(timeout=2)
+    assert result == [[{"date": "2025-06-19", "score": 4}]]
+    writer.rollback()
+    writer.close()
+    db.close()
+
+
+def _mixed_workload(db, writes=50, readers=4):
+    stop = threading.Event()
+    errors = []
+
+    def read_loop():
+        try:
+            while not stop.is_set():
+                db.get_range("2025-06-16", "2025-06-22")
+                db.get_mood_series()
+        except Exception as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for i in range(writes):
+        db.save_habit("2025-06-19", f"h{i}", i)
+    stop.set()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(db.get_range("2025-06-19", "2025-06-19")["2025-06-19"]) == writes
+
+
+def test_sqlite_pooled_writes_under_concurrent_reads(tmp_path):
+    db = SQLiteBackend(db_path=tmp_path / "p.db", pooled=True, maxconn=3)
+    _mixed_workload(db, readers=4)
+    # Four readers plus the writer share at most three connections.
+    assert db.pool.size <= 3
+    db.close()
+
+
+class FakePGError(Exception):
+    pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        if self.conn.closed:
+            raise FakePGError("connection already closed")
+        self.conn.driver.statements.append(sql.strip().split()[0])
+        time.sleep(self.conn.driver.latency)
+
+    def executemany(self, sql, seq):
+        for params in seq:
+            self.execute(sql, params)
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, driver):
+        self.driver = driver
+        self.closed = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeDriver:
+    """Minimal DB-API module standing in for psycopg2."""
+
+    OperationalError = FakePGError
+    InterfaceError = FakePGError
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.connections = []
+        self.statements = []
+
+    def connect(self, url):
+        conn = FakeConnection(self)
+        self.connections.append(conn)
+        return conn
+
+
+def test_postgres_reconnects_after_dropped_connection():
+    driver = FakeDriver()
+    db = storage.PostgresBackend("postgres://fake", driver=driver)
+    assert len(driver.connections) == 1
+
+    driver.connections[0].closed = 2  # server went away while idle
+    db.save_mood("2025-06-19", 4)
+    assert len(driver.connections) == 2
+
+    # Drop it mid-checkout: the first attempt fails, the retry succeeds.
+    db.pool._healthy = lambda conn, idle_since: True
+    driver.connections[1].closed = 2
+    db.save_habit("2025-06-19", "med", 5)
+    assert len(driver.connections) == 3
+    assert driver.statements[-1] == "INSERT"
+    assert db.pool.size == 1
+
+
+def test_postgres_pool_serves_concurrent_operations():
+    driver = FakeDriver()
+    db = storage.PostgresBackend("postgres://fake", maxconn=4, driver=driver)
+    driver.latency = 0.02
+    start = time.perf_counter()
+    db.save_mood("2025-06-19", 3)
+    single = time.perf_counter() - start
+
+    threads = [
+        threading.Thread(target=db.save_mood, args=("2025-06-19", 3))
+        for _ in range(8)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    # One shared connection would need eight back-to-back round trips.
+    assert elapsed < 8 * single * 0.6
+    assert db.pool.size <= 4
+
+
+def test_connection_pool_blocks_at_max_size():
+    driver = FakeDriver()
+    pool = storage.ConnectionPool(lambda: driver.connect(None), 0, 1, timeout=0.05)
+    conn = pool.getconn()
+    try:
+        pool.getconn()
+    except RuntimeError as e:
+        assert "exhausted" in str(e)
+    else:  # pragma: no cover
+        raise AssertionError("pool handed out more than maxconn")
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+
+
+def _backfill(days):
+    start = datetime.date(2020, 1, 1)
+    for i in range(days):
+        day = str(start + datetime.timedelta(days=i))
+        yield {"date": day, "habit": "med", "duration": 10, "note": "n"}
+        yield {"date": day, "habit": "read", "duration": 20}
+        yield {"date": day, "mood": 1 + i % 5}
+
+
+def test_import_entries_single_transaction(tmp_path):
+    json_db = JSONBackend(tmp_path / "log.json", journal=True)
+    sqlite_db = SQLiteBackend(db_path=tmp_path / "b.db")
+    for db in (json_db, sqlite_db):
+        start = time.perf_counter()
+        assert db.import_entries(_backfill(20000)) == 60000
+        assert time.perf_counter() - start < 10
+        day = db.get_range("2020-01-03", "2020-01-03")["2020-01-03"]
+        assert day == {
+            "med": {"duration": 10, "note": "n"},
+            "read": {"duration": 20, "note": ""},
+            "mood": 3,
+        }
+    assert not json_db.wal.exists()
+
+
+def test_import_entries_rejects_bad_record(tmp_path):
+    db = SQLiteBackend(db_path=tmp_path / "b.db")
+    entries = [
+        {"date": "2025-06-19", "mood": 4},
+        {"date": "2025-06-20", "habit": "med", "duration": "ten"},
+    ]
+    try:
+        db.import_entries(entries)
+    except ValueError as e:
+        assert "record 1" in str(e)
+    else:  # pragma: no cover
+        raise AssertionError("bad record accepted")
+    assert db.get_mood_series() == []
+
+
+def test_sqlite_upgrades_legacy_text_schema(tmp_path):
+    path = tmp_path / "legacy.db"
+    legacy = sqlite3.connect(path)
+    legacy.executescript(
+        """
+        CREATE TABLE habit_log (
+          date TEXT, habit TEXT, duration INT, note TEXT,
+          PRIMARY KEY(date, habit)
+        );
+        CREATE TABLE mood_log (date TEXT PRIMARY KEY, score INT);
+        INSERT INTO habit_log VALUES ('2025-06-19', 'med', 10, 'calm');
+        INSERT INTO habit_log VALUES ('garbage', 'med', 1, '');
+        INSERT INTO mood_log VALUES ('2025-06-19', 4);
+        """
+    )
+    legacy.commit()
+    legacy.close()
+
+    db = SQLiteBackend(db_path=path)
+    assert db.load_all() == {
+        "2025-06-19": {"med": {"duration": 10, "note": "calm"}, "mood": 4}
+    }
+    with db._connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT day FROM habit_log WHERE habit = ? AND day <= ?",
+            ("med", 739421),
+        ).fetchall()
+    assert version == storage.SCHEMA_VERSION
+    assert "habit_log_habit_day" in str(plan)
+
+    # Re-opening an upgraded database is a no-op.
+    db.close()
+    assert SQLiteBackend(db_path=path).get_mood_series() == [
+        {"date": "2025-06-19", "score": 4}
+    ]
+
+
+def test_iter_entries_same_order_across_backends(tmp_path):
+    entries = [
+        {"date": "2025-06-20", "mood": 2},
+        {"date": "2025-06-19", "habit": "read", "duration": 5, "note": "x"},
+        {"date": "2025-06-19", "habit": "med", "duration": 10},
+        {"date": "2025-06-19", "mood": 4},
+        {"date": "2025-06-22", "habit": "med", "duration": 1},
+    ]
+    expected = [
+        storage.HabitEntry("2025-06-19", "med", 10, ""),
+        storage.HabitEntry("2025-06-19", "read", 5, "x"),
+        storage.MoodEntry("2025-06-19", 4),
+        storage.MoodEntry("2025-06-20", 2),
+    ]
+    for db in (
+        JSONBackend(tmp_path / "log.json"),
+        SQLiteBackend(db_path=tmp_path / "i.db"),
+    ):
+        db.import_entries(entries)
+        assert list(db.iter_entries(end="2025-06-21")) == expected
+        assert list(db.iter_entries(start="2025-06-20", kinds=("habit",))) == [
+            storage.HabitEntry("2025-06-22", "med", 1, "")
+        ]
+        assert [e.score for e in db.iter_entries(kinds=("mood",))] == [4, 2]
+
+
+def test_sqlite_iter_entries_streams_from_cursor(tmp_path):
+    db = SQLiteBackend(db_path=tmp_path / "i.db")
+    db.import_entries(_backfill(2000))
+    rows = db.iter_entries()
+    assert next(rows) == storage.HabitEntry("2020-01-01", "med", 10, "n")
+    rows.close()
+
+
+def test_data_version_tracks_writes_per_week(tmp_path):
+    for db in (
+        JSONBackend(tmp_path / "log.json"),
+        JSONBackend(tmp_path / "wal.json", journal=True),
+        SQLiteBackend(db_path=tmp_path / "v.db"),
+    ):
+        week = ("2025-06-16", "2025-06-22")
+        other = ("2025-06-23", "2025-06-29")
+        before = db.get_data_version(*week)
+        untouched = db.get_data_version(*other)
+        assert db.get_data_version(*week) == before
+
+        db.save_habit("2025-06-19", "med", 10)
+        after_habit = db.get_data_version(*week)
+        assert after_habit != before
+        db.save_mood("2025-06-22", 3)
+        after_mood = db.get_data_version(*week)
+        assert after_mood != after_habit
+        db.delete_habit("2025-06-19", "med")
+        assert db.get_data_version(*week) != after_mood
+        assert db.get_data_version(*other) == untouched
+
+        db.import_entries([{"date": "2025-06-24", "mood": 1}])
+        assert db.get_data_version(*other) != untouched
+
+
+def test_json_data_version_changes_on_external_write(tmp_path):
+    path = tmp_path / "log.json"
+    db = JSONBackend(path)
+    version = db.get_data_version("2025-06-16", "2025-06-22")
+    path.write_text(json.dumps({"2025-06-19": {"mood": 2}}))
+    assert db.get_data_version("2025-06-16", "2025-06-22") != version
+
+
+def test_last_write_version_bumps_on_every_write(tmp_path):
+    for db in (
+        JSONBackend(tmp_path / "log.json"),
+        SQLiteBackend(db_path=tmp_path / "w.db"),
+    ):
+        seen = [db.get_last_write()[0]]
+        db.save_habit("2025-06-19", "med", 10)
+        seen.append(db.get_last_write()[0])
+        db.save_mood("2025-06-19", 4)
+        seen.append(db.get_last_write()[0])
+        db.touch()
+        version, written_at = db.get_last_write()
+        seen.append(version)
+        assert len(set(map(repr, seen))) == 4
+        assert abs(written_at - time.time()) < 60
+
+
+def test_journal_store_indexes_legacy_file_and_appends(tmp_path):
+    path = tmp_path / "journal.md"
+    path.write_text("stray preamble\n## 2025-06-01\nfirst\n\n## 2025-06-02\nsecond\n")
+    store = storage.JournalStore(path)
+    assert store.entries() == [
+        {"date": "2025-06-02", "text": "second\n"},
+        {"date": "2025-06-01", "text": "first\n\n"},
+    ]
+    assert store.index_path.exists()
+
+    store.append("2025-06-03", "third  ")
+    # An external writer (older app version) appending to the same file.
+    with open(path, "a") as f:
+        f.write("\n## 2025-06-04\nfourth\n")
+    fresh = storage.JournalStore(path)
+    assert fresh.count() == 4
+    assert fresh.entries(0, 2) == [
+        {"date": "2025-06-04", "text": "fourth\n"},
+        {"date": "2025-06-03", "text": "third\n\n"},
+    ]
+
+    # A hand edit that moves headers forces a full rebuild.
+    path.write_text("## 2025-07-01\nrewritten\n")
+    assert fresh.entries() == [{"date": "2025-07-01", "text": "rewritten\n"}]
+
+
+def test_bit_helpers():
+    bits = storage.bits_from_runs([(10, 12), (15, 15), (30, 40)], 11, 20)
+    assert bits == 0b10011
+    assert storage.count_bits(bits, 0, 2) == 2
+    assert storage.count_bits(bits, 2, 10) == 1
+    assert storage.longest_run(bits) == 2
+    assert storage.longest_run(0b1110111101) == 4
+    assert storage.longest_run(0) == 0
+
+
+def test_completion_bits_follow_writes_across_backends(tmp_path):
+    for db in (
+        JSONBackend(tmp_path / "log.json"),
+        JSONBackend(tmp_path / "wal.json", journal=True),
+        SQLiteBackend(db_path=tmp_path / "b.db"),
+    ):
+        db.import_entries(
+            [
+                {"date": "2024-12-31", "habit": "med", "duration": 5},
+                {"date": "2025-01-01", "habit": "med", "duration": 5},
+                {"date": "2025-01-03", "habit": "med", "duration": 0},
+                {"date": "2025-01-04", "habit": "read", "duration": 1},
+            ]
+        )
+        year = ("2025-01-01", "2025-12-31")
+        assert db.get_completion_bits(("med", "read", "yoga"), *year) == {
+            "med": 0b1,
+            "read": 0b1000,
+            "yoga": 0,
+        }
+        db.save_habit("2025-01-02", "med", 10)
+        db.save_habit("2025-12-31", "med", 10)
+        db.delete_habit("2025-01-04", "read")
+        db.save_habit("2024-06-01", "read", 3)
+        bits = db.get_completion_bits(("med", "read"), *year)
+        assert bits == {"med": 0b11 | 1 << 364, "read": 0}
+        assert db.get_completion_bits(("med",), "2024-12-31", "2025-01-01") == {
+            "med": 0b11
+        }
+
+
+def _synthetic_history(years=10, habits=20):
+    rng = random.Random(3)
+    first = datetime.date(2015, 1, 1).toordinal()
+    names = [f"habit{i}" for i in range(habits)]
+    for day in range(first, first + 365 * years):
+        date = storage.from_day_number(day)
+        for habit in names:
+            note = "walked by the lake" if rng.random() < 0.05 else ""
+            yield storage.HabitEntry(date, habit, rng.randint(1, 90), note)
+        yield storage.MoodEntry(date, rng.randint(1, 5))
+
+
+def test_compact_history_reads_like_load_all(tmp_path):
+    for db in (
+        JSONBackend(tmp_path / "c.json"),
+        SQLiteBackend(db_path=tmp_path / "c.db"),
+    ):
+        db.import_entries(
+            [
+                {"date": "2025-06-19", "habit": "med", "duration": 10, "note": "calm"},
+                {"date": "2025-06-19", "habit": "read", "duration": 70000},
+                {"date": "2025-06-19", "mood": 4},
+                {"date": "2025-06-21", "habit": "med", "duration": 0},
+                {"date": "2025-06-22", "mood": 2},
+            ]
+        )
+        history = db.load_compact()
+        assert history == db.load_all()
+        assert list(history) == ["2025-06-19", "2025-06-21", "2025-06-22"]
+        day = history["2025-06-19"]
+        assert day["mood"] == 4 and sorted(day) == ["med", "mood", "read"]
+        assert day.get("med").duration == 10 and day["med"]["note"] == "calm"
+        assert day["read"]["duration"] == 70000
+        assert history.get("2025-06-20", {}).get("med") is None
+        assert "nope" not in history
+        assert list(storage.iter_dict_entries(history)) == list(db.iter_entries())
+
+
+def test_compact_history_memory_budget():
+    """Ten years of 20 daily habits stays far below the nested-dict form."""
+    budget = int(os.getenv("COMPACT_HISTORY_BUDGET", str(3 * 1024 * 1024)))
+    tracemalloc.start()
+    try:
+        history = storage.CompactHistory.from_entries(_synthetic_history())
+        _, compact_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        data = {}
+        for entry in _synthetic_history():
+            day = data.setdefault(entry.date, {})
+            if isinstance(entry, storage.HabitEntry):
+                day[entry.habit] = {"duration": entry.duration, "note": entry.note}
+            else:
+                day["mood"] = entry.score
+        dict_peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    assert len(history) == 3650
+    assert compact_peak < budget
+    assert compact_peak * 5 < dict_peak
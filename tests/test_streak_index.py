@@ -0,0 +1,93 @@
+import datetime
+import random
+
+import app
+import storage
+
+
+def set_today(monkeypatch, target):
+    class FixedDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return target
+    monkeypatch.setattr(app.datetime, "date", FixedDate)
+
+
+HABITS = {"med": {"label": "Meditation"}, "read": {"label": "Read"}}
+
+
+def longest_run(data, habit):
+    best = run = 0
+    prev = None
+    for entry in storage.iter_dict_entries(data, kinds=("habit",)):
+        if entry.habit != habit or not entry.duration:
+            continue
+        day = storage.to_day_number(entry.date)
+        run = run + 1 if prev == day - 1 else 1
+        best = max(best, run)
+        prev = day
+    return best
+
+
+def check_against_full_scan(db, today):
+    week = app.get_week_range()
+    expected = app.calculate_habit_stats(db.load_all(), week)
+    streaks = db.get_streaks(HABITS, str(today))
+    for habit in HABITS:
+        assert streaks[habit]["streak"] == expected[habit]["streak"]
+        assert streaks[habit]["longest"] == longest_run(db.load_all(), habit)
+    week_data = db.get_range(str(week[0]), str(week[-1]))
+    assert app.summarize_habit_stats(HABITS, week_data, week, streaks) == expected
+
+
+def test_streak_index_matches_backward_walk(monkeypatch, tmp_path):
+    today = datetime.date(2025, 3, 12)
+    set_today(monkeypatch, today)
+    monkeypatch.setattr(app, "load_config", lambda: HABITS)
+    rng = random.Random(7)
+    backends = [
+        storage.JSONBackend(tmp_path / "log.json", journal=True, compact_every=40),
+        storage.SQLiteBackend(db_path=tmp_path / "s.db"),
+    ]
+    for db in backends:
+        db.get_streaks(HABITS, str(today))  # build before edits
+    for step in range(300):
+        day = str(today - datetime.timedelta(days=rng.randrange(-3, 25)))
+        habit = rng.choice(list(HABITS))
+        action = rng.random()
+        for db in backends:
+            if action < 0.6:
+                db.save_habit(day, habit, rng.choice([0, 5, 10]) if action < 0.1 else 5)
+            else:
+                db.delete_habit(day, habit)
+        if step % 25 == 0:
+            for db in backends:
+                check_against_full_scan(db, today)
+    for db in backends:
+        check_against_full_scan(db, today)
+
+
+def test_past_edit_joins_and_splits_runs(tmp_path):
+    db = storage.SQLiteBackend(db_path=tmp_path / "s.db")
+    for day in ("2025-03-01", "2025-03-02", "2025-03-04", "2025-03-05"):
+        db.save_habit(day, "med", 5)
+    assert db.get_streaks(["med"], "2025-03-05")["med"] == {
+        "streak": 2, "longest": 2, "last_completed": "2025-03-05",
+    }
+    db.save_habit("2025-03-03", "med", 5)
+    assert db.get_streaks(["med"], "2025-03-05")["med"]["streak"] == 5
+    db.delete_habit("2025-03-02", "med")
+    assert db.get_streaks(["med"], "2025-03-05")["med"] == {
+        "streak": 3, "longest": 3, "last_completed": "2025-03-05",
+    }
+
+
+def test_rebuild_streaks_repairs_index(tmp_path):
+    db = storage.SQLiteBackend(db_path=tmp_path / "s.db")
+    db.import_entries(
+        {"date": f"2025-03-0{d}", "habit": "med", "duration": 5} for d in range(1, 8)
+    )
+    db._run(lambda cur: cur.execute("DELETE FROM habit_runs"))
+    assert db.get_streaks(["med"], "2025-03-07")["med"]["streak"] == 0
+    db.rebuild_streaks()
+    assert db.get_streaks(["med"], "2025-03-07")["med"]["longest"] == 7
@@ -52,3 +52,20 @@ def test_streak_reset_after_gap(monkeypatch):
     stats = app.calculate_habit_stats(data, week)
     assert stats["med"]["streak"] == 1
     assert stats["med"]["avg_duration"] == 5
+
+
+def test_stats_consume_entry_stream(monkeypatch, tmp_path):
+    import storage
+
+    today = datetime.date(2025, 1, 7)
+    set_today(monkeypatch, today)
+    monkeypatch.setattr(app, "load_config", base_config)
+    db = storage.SQLiteBackend(db_path=tmp_path / "s.db")
+    for day in ("2025-01-05", "2025-01-06", "2025-01-07", "2025-01-08"):
+        db.save_habit(day, "med", 6)
+    db.save_mood("2025-01-07", 4)
+    week = app.get_week_range()
+    stats = app.calculate_habit_stats(db.iter_entries(kinds=("habit",)), week)
+    assert stats["med"] == {"label": "Meditation", "streak": 3, "avg_duration": 6}
+    mood = app.calculate_mood_stats(db.iter_entries(kinds=("mood",)))
+    assert mood["weekly_avg"] == 4